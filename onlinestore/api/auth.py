@@ -0,0 +1,48 @@
+from django.contrib.auth import SESSION_KEY, login
+from django.contrib.auth.models import User
+
+from shop.models import TelegramUser
+
+
+TELEGRAM_SESSION_KEY = '_telegram_id'
+
+
+def telegram_login(request, user_data):
+    """
+    Логинит пользователя Mini App по данным `user` из initData, возвращает id User.
+
+    Если сессия уже принадлежит этому telegram_id, БД не трогается и сессия
+    не ротируется. Новые пользователи создаются без пароля (set_unusable_password),
+    изменившиеся поля профиля сохраняются одним UPDATE.
+    """
+    telegram_id = user_data['id']
+    if request.session.get(TELEGRAM_SESSION_KEY) == telegram_id and SESSION_KEY in request.session:
+        return int(request.session[SESSION_KEY])
+
+    profile = {
+        'username': user_data.get('username'),
+        'first_name': user_data.get('first_name'),
+        'last_name': user_data.get('last_name'),
+    }
+    tg_user, created = TelegramUser.objects.select_related('user').get_or_create(
+        telegram_id=telegram_id,
+        defaults=profile
+    )
+    changed = {field: value for field, value in profile.items() if getattr(tg_user, field) != value}
+    if changed:
+        TelegramUser.objects.filter(pk=tg_user.pk).update(**changed)
+
+    user = tg_user.user
+    if user is None:
+        user = User(
+            username=f"tg_{telegram_id}",
+            first_name=profile['first_name'] or '',
+            last_name=profile['last_name'] or '',
+        )
+        user.set_unusable_password()
+        user.save()
+        TelegramUser.objects.filter(pk=tg_user.pk).update(user=user)
+
+    login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+    request.session[TELEGRAM_SESSION_KEY] = telegram_id
+    return user.pk
@@ -0,0 +1,51 @@
+import hashlib
+import hmac
+import json
+import time
+import timeit
+from urllib.parse import parse_qsl, urlencode
+
+from django.core.management.base import BaseCommand
+
+from api.utils import WebAppInitDataVerifier, check_webapp_signature, parse_init_data
+
+
+class Command(BaseCommand):
+    help = 'Микробенчмарк проверки initData Telegram Mini App'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help='Число вызовов на замер')
+
+    def handle(self, *args, **options):
+        token = '123456:TEST-TOKEN'
+        init_data = self.make_init_data(token)
+        number = options['number']
+
+        def legacy():
+            # Прежний путь: секрет на каждый вызов и двойной разбор строки
+            parsed = dict(parse_qsl(init_data))
+            hash_ = parsed.pop('hash')
+            data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(parsed.items()))
+            secret_key = hmac.new(b"WebAppData", token.encode(), hashlib.sha256)
+            ok = hmac.new(secret_key.digest(), data_check_string.encode(), hashlib.sha256).hexdigest() == hash_
+            return ok and parse_init_data(init_data, json.loads)
+
+        verifier = WebAppInitDataVerifier(token, max_age=60)
+        assert check_webapp_signature(token, init_data)
+
+        for name, func in (('legacy', legacy), ('verifier', lambda: verifier.verify(init_data))):
+            seconds = min(timeit.repeat(func, number=number, repeat=5))
+            self.stdout.write(f'{name:>10}: {seconds / number * 1e6:.2f} µs/call')
+
+    @staticmethod
+    def make_init_data(token):
+        data = {
+            'auth_date': str(int(time.time())),
+            'query_id': 'AAHdF6IQAAAAAN0XohDhrOrc',
+            'user': json.dumps({'id': 279058397, 'first_name': 'Ivan', 'username': 'ivan', 'language_code': 'ru'}),
+        }
+        data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+        secret_key = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+        data['hash'] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+        return urlencode(data)
+
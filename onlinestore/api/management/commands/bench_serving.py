@@ -0,0 +1,164 @@
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from importlib import import_module
+
+import aiohttp
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Product
+
+
+SERVERS = {
+    'wsgi': lambda port, workers, threads: [
+        sys.executable, '-m', 'gunicorn', 'onlinestore.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+        '--log-level', 'warning',
+    ],
+    'asgi': lambda port, workers, threads: [
+        sys.executable, '-m', 'uvicorn', 'onlinestore.asgi:application',
+        '--port', str(port), '--workers', str(workers),
+        '--log-level', 'warning', '--no-access-log',
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение WSGI (gunicorn) и ASGI (uvicorn) под параллельной нагрузкой Mini App: '
+        'сервер запускается на время замера, клиенты по кругу открывают карточки товаров и корзину'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='wsgi,asgi', help='Какие серверы мерить, через запятую')
+        parser.add_argument('--concurrency', default='10,50,200', help='Числа одновременных клиентов, через запятую')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность замера, секунды')
+        parser.add_argument('--workers', type=int, default=2, help='Процессов сервера')
+        parser.add_argument('--threads', type=int, default=8, help='Потоков на процесс gunicorn')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--user', help='Пользователь, от имени которого запрашивается корзина')
+
+    def handle(self, *args, **options):
+        servers = options['servers'].split(',')
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f'Неизвестные серверы: {", ".join(sorted(unknown))}')
+
+        product_ids = list(Product.objects.filter(available=True).values_list('id', flat=True)[:200])
+        if not product_ids:
+            raise CommandError('Нет доступных товаров')
+        paths = [f'/api/products/{product_id}/' for product_id in product_ids]
+        random.Random(0).shuffle(paths)
+
+        session = self.login(options['user']) if options['user'] else None
+        cookies = {settings.SESSION_COOKIE_NAME: session.session_key} if session else {}
+        if session:
+            # Каждый третий запрос — корзина
+            paths = [
+                path for i, product_path in enumerate(paths)
+                for path in ((product_path, '/api/cart/') if i % 2 else (product_path,))
+            ]
+
+        self.stdout.write(f'{"server":>6} {"clients":>7} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"errors":>6}')
+        try:
+            for server in servers:
+                process = self.start(server, options)
+                try:
+                    base_url = f'http://127.0.0.1:{options["port"]}'
+                    asyncio.run(self.wait_ready(base_url, paths[0], process))
+                    # Прогрев: кэш каталога и соединения с БД
+                    asyncio.run(self.load(base_url, paths, cookies, 10, 1))
+                    for concurrency in map(int, options['concurrency'].split(',')):
+                        latencies, errors, elapsed = asyncio.run(
+                            self.load(base_url, paths, cookies, concurrency, options['duration'])
+                        )
+                        self.report(server, concurrency, latencies, errors, elapsed)
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+        finally:
+            if session:
+                session.delete()
+
+    @staticmethod
+    def login(username):
+        # То же, что Client.force_login: сессия с пользователем без пароля
+        user = get_user_model().objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f'Пользователь {username} не найден')
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
+
+    @staticmethod
+    def start(server, options):
+        command = SERVERS[server](options['port'], options['workers'], options['threads'])
+        try:
+            return subprocess.Popen(command, cwd=settings.BASE_DIR, env=os.environ.copy())
+        except OSError as e:
+            raise CommandError(f'Не удалось запустить {server}: {e}')
+
+    @staticmethod
+    async def wait_ready(base_url, path, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        async with aiohttp.ClientSession(base_url) as session:
+            while time.monotonic() < deadline:
+                if process.poll() is not None:
+                    raise CommandError(f'Сервер завершился с кодом {process.returncode}')
+                try:
+                    async with session.get(path) as response:
+                        if response.status == 200:
+                            return
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise CommandError('Сервер не ответил за отведённое время')
+
+    @staticmethod
+    async def load(base_url, paths, cookies, concurrency, duration):
+        latencies = []
+        errors = 0
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(base_url, cookies=cookies, connector=connector) as session:
+            started = time.perf_counter()
+            deadline = started + duration
+
+            async def client(offset):
+                nonlocal errors
+                index = offset
+                while time.perf_counter() < deadline:
+                    path = paths[index % len(paths)]
+                    index += 1
+                    request_started = time.perf_counter()
+                    try:
+                        async with session.get(path) as response:
+                            await response.read()
+                            ok = response.status == 200
+                    except aiohttp.ClientError:
+                        ok = False
+                    if ok:
+                        latencies.append(time.perf_counter() - request_started)
+                    else:
+                        errors += 1
+
+            await asyncio.gather(*(client(offset * 7) for offset in range(concurrency)))
+            return latencies, errors, time.perf_counter() - started
+
+    def report(self, server, concurrency, latencies, errors, elapsed):
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0
+
+        self.stdout.write(
+            f'{server:>6} {concurrency:>7} {len(latencies) / elapsed:>9.1f} '
+            f'{percentile(0.5):>8.1f} {percentile(0.95):>8.1f} {errors:>6}'
+        )
@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class ProductCursorPagination(CursorPagination):
+    """Курсорная пагинация каталога: стабильный порядок по (-created, id)"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created', 'id')
+
+
+class ProductSearchPagination(LimitOffsetPagination):
+    """Результаты поиска упорядочены по релевантности, поэтому limit/offset"""
+    default_limit = 20
+    max_limit = 100
+
+
+class OrderCursorPagination(CursorPagination):
+    """История заказов: курсор по (-created_at, id), без OFFSET на глубоких страницах"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
@@ -3,7 +3,9 @@ from shop.models import (Product,
                          ProductSize,
                          Size,
                          CartItem,
-                         Order)
+                         Order,
+                         OrderItem)
+from shop.images import FORMATS, VARIANTS
 
 
 class SizeSerializer(serializers.ModelSerializer):
@@ -22,25 +24,82 @@ class ProductSizeSerializer(serializers.ModelSerializer):
 
 class ProductSerializer(serializers.ModelSerializer):
     product_sizes = ProductSizeSerializer(many=True, read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'image', 'product_sizes']
+        fields = ['id', 'name', 'description', 'price', 'image', 'image_variants', 'product_sizes']
 
-class CartItemSerializer(serializers.Serializer):
-    product = ProductSerializer()
-    size = SizeSerializer()
-    total_price = serializers.SerializerMethodField()
+    def get_image_variants(self, obj):
+        """{'thumb': {'webp': url, 'jpeg': url}, ...}; пока варианты не готовы — None"""
+        if not obj.has_image_variants:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for variant in VARIANTS:
+            urls[variant] = {}
+            for fmt in FORMATS:
+                url = obj.image_url(variant, fmt)
+                urls[variant][fmt] = request.build_absolute_uri(url) if request else url
+        return urls
+
+class CartLineSerializer(serializers.ModelSerializer):
+    """Позиция корзины без вложенного товара: только то, что нужно для строки"""
+    product_id = serializers.IntegerField()
+    name = serializers.CharField(source='product.name')
+    slug = serializers.CharField(source='product.slug')
+    price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2, coerce_to_string=False)
+    image = serializers.SerializerMethodField()
+    size_id = serializers.IntegerField(allow_null=True)
+    size = serializers.CharField(source='size.name', default=None)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False)
 
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'size', 'quantity', 'total_price']
+        fields = ['id', 'product_id', 'name', 'slug', 'price', 'image', 'size_id', 'size', 'quantity', 'total_price']
+
+    def get_image(self, obj):
+        url = obj.product.image_url('thumb')
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request and url else url
+
+
+class CartOperationSerializer(serializers.Serializer):
+    OPERATIONS = ('add', 'update', 'remove')
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_id = serializers.IntegerField(min_value=1)
+    size_id = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+    quantity = serializers.IntegerField(min_value=0, max_value=100, default=1)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'add' and attrs['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': 'Для add количество должно быть больше нуля'})
+        return attrs
 
-    def get_total_price(self, obj):
-        return float(obj.product.price) * obj.quantity
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(
+        child=CartOperationSerializer(), allow_empty=False, max_length=100
+    )
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='product.name')
+    size = serializers.CharField(source='size.name', default=None)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product_id', 'name', 'size_id', 'size', 'quantity', 'price', 'total_price']
 
 
 class OrderSerializer(serializers.ModelSerializer):
+    """Заказ с позициями; позиции ожидаются предзагруженными (Order.objects.with_items())"""
+    status_display = serializers.CharField(source='get_status_display')
+    items = OrderItemSerializer(many=True)
+
     class Meta:
         model = Order
-        fields = ['id', 'total', 'created_at', 'comment']
+        fields = ['id', 'status', 'status_display', 'total', 'created_at', 'comment', 'items']
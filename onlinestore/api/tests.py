@@ -1,3 +1,288 @@
-from django.test import TestCase
+from unittest import skipUnless
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from onlinestore.metrics import QueryBudgetMixin
+from shop.models import Cart, CartItem, Category, Order, OrderItem, Product, ProductSize, Size
+from shop.services import set_favorite
+
+from .management.commands.bench_init_data import Command as InitDataBenchmark
+from .pagination import ProductCursorPagination
+from .utils import get_webapp_verifier
+from .views import product_queryset
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Планы запросов проверяются на PostgreSQL')
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        for i in range(20):
+            Product.objects.create(
+                category=category, name=f'Товар {i}', slug=f'product-{i}',
+                description='', price=100, image='products/1.jpg',
+            )
+
+    def test_product_list_page(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        pagination = ProductCursorPagination
+        queryset = product_queryset().order_by(*pagination.ordering)[:pagination.page_size + 1]
+        plan = queryset.explain()
+        self.assertIn('product_available_created_idx', plan, plan)
+
+
+class CartBatchTests(QueryBudgetMixin, TestCase):
+    url = '/api/cart/batch/'
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        cls.size = Size.objects.create(name='M', code='m')
+        cls.products = []
+        for i in range(3):
+            product = Product.objects.create(
+                category=category, name=f'Товар {i}', slug=f'product-{i}',
+                description='', price=100, image='products/1.jpg',
+            )
+            ProductSize.objects.create(product=product, size=cls.size, quantity=5)
+            cls.products.append(product)
+        cls.user = User.objects.create_user('buyer')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, *operations):
+        return self.client.post(self.url, {'operations': list(operations)}, content_type='application/json')
+
+    def op(self, op, product, quantity=1):
+        return {'op': op, 'product_id': product.id, 'size_id': self.size.id, 'quantity': quantity}
+
+    def test_apply_operations(self):
+        first, second, third = self.products
+        self.post(self.op('add', first), self.op('add', second))
+
+        with self.assertNumQueries(13):
+            response = self.post(
+                self.op('add', first, 2), self.op('remove', second), self.op('update', third, 4)
+            )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [(item['product_id'], item['quantity']) for item in data['items']],
+            [(first.id, 3), (third.id, 4)],
+        )
+        self.assertEqual((data['total_price'], data['total_quantity']), (700.0, 7))
+
+    def test_out_of_stock_rolls_back(self):
+        first, second, _ = self.products
+        response = self.post(self.op('add', first), self.op('update', second, 6))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['items'], [{'product_id': second.id, 'size_id': self.size.id, 'requested': 6}])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_unknown_size(self):
+        response = self.post({'op': 'add', 'product_id': self.products[0].id, 'size_id': 999})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_cart_etag(self):
+        self.post(self.op('add', self.products[0], 2))
+
+        # Сессия, пользователь и сама корзина
+        response = self.client.get('/api/cart/')
+        self.assertQueryBudget(response)
+        self.assertEqual(response.json()['items'][0]['total_price'], 200.0)
+        etag = response['ETag']
+
+        response = self.client.get('/api/cart/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.post(self.op('add', self.products[0]))
+        response = self.client.get('/api/cart/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='123456:TEST-TOKEN')
+class InitDataVerifierTests(TestCase):
+    def test_non_ascii_hash(self):
+        parsed = dict(parse_qsl(InitDataBenchmark.make_init_data('123456:TEST-TOKEN')))
+        parsed['hash'] = 'подпись'
+        init_data = urlencode(parsed)
+
+        with self.assertRaises(ValueError):
+            get_webapp_verifier('123456:TEST-TOKEN').verify(init_data)
+        response = self.client.post('/api/auth/', {'init_data': init_data}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncViewTests(QueryBudgetMixin, TestCase):
+    """
+    Горячие эндпоинты: под ASGI — async-представления (проверяются через
+    ASGI-клиент с URLconf из asgi.py), под WSGI — представления DRF.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        size = Size.objects.create(name='M', code='m')
+        cls.product = Product.objects.create(
+            category=category, name='Товар', slug='product', description='', price=150, image='products/1.jpg',
+        )
+        ProductSize.objects.create(product=cls.product, size=size, quantity=5)
+        cls.hidden = Product.objects.create(
+            category=category, name='Скрытый', slug='hidden', description='', price=150,
+            image='products/1.jpg', available=False,
+        )
+        cls.user = User.objects.create_user('buyer')
+        cart = Cart.objects.create(user=cls.user)
+        CartItem.objects.create(cart=cart, product=cls.product, size=size, quantity=2)
+
+    def test_wsgi_views(self):
+        response = self.client.get(f'/api/products/{self.product.id}/')
+        self.assertQueryBudget(response)
+        wsgi_data = response.json()
+        self.assertEqual(self.client.get(f'/api/products/{self.hidden.id}/').status_code, 404)
+        forbidden = self.client.get('/api/cart/')
+        self.assertEqual(forbidden.status_code, 403)
+
+        # Async-версии отвечают тем же
+        with override_settings(ROOT_URLCONF='onlinestore.urls_asgi'):
+            response = async_to_sync(self.async_client.get)(f'/api/products/{self.product.id}/')
+            self.assertEqual(response.json(), wsgi_data)
+            response = async_to_sync(self.async_client.get)('/api/cart/')
+            self.assertEqual((response.status_code, response.json()), (403, forbidden.json()))
+
+    @override_settings(ROOT_URLCONF='onlinestore.urls_asgi')
+    async def test_product_detail(self):
+        response = await self.async_client.get(f'/api/products/{self.product.id}/')
+        self.assertEqual(response.status_code, 200)
+        # Товар и его размеры; запросы из потока async ORM тоже посчитаны
+        self.assertEqual(response.query_stats.queries, 2)
+        self.assertQueryBudget(response)
+        data = response.json()
+        self.assertEqual((data['id'], data['price']), (self.product.id, '150.00'))
+        self.assertEqual(data['product_sizes'][0]['size']['name'], 'M')
+
+        response = await self.async_client.get(f'/api/products/{self.hidden.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(ROOT_URLCONF='onlinestore.urls_asgi')
+    async def test_cart(self):
+        response = await self.async_client.get('/api/cart/')
+        self.assertEqual(response.status_code, 403)
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/cart/')
+        self.assertQueryBudget(response)
+        self.assertEqual(response.json()['total_price'], 300.0)
+
+        response = await self.async_client.get('/api/cart/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='123456:TEST-TOKEN')
+class BootstrapTests(QueryBudgetMixin, TestCase):
+    url = '/api/bootstrap/'
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        cls.size = Size.objects.create(name='M', code='m')
+        cls.products = []
+        for i in range(3):
+            product = Product.objects.create(
+                category=category, name=f'Товар {i}', slug=f'product-{i}',
+                description='', price=100, image='products/1.jpg',
+            )
+            ProductSize.objects.create(product=product, size=cls.size, quantity=5)
+            cls.products.append(product)
+
+    def post(self, init_data):
+        return self.client.post(self.url, {'init_data': init_data}, content_type='application/json')
+
+    def test_invalid_signature(self):
+        init_data = InitDataBenchmark.make_init_data('654321:OTHER-TOKEN')
+        self.assertEqual(self.post(init_data).status_code, 403)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_bootstrap(self):
+        init_data = InitDataBenchmark.make_init_data('123456:TEST-TOKEN')
+        response = self.post(init_data)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['user']['id'], 279058397)
+        self.assertEqual(len(data['products']['results']), 3)
+        self.assertIn('facets', data['products'])
+        self.assertEqual((data['cart']['items'], data['favorite_ids']), ([], []))
+
+        user = User.objects.get(username='tg_279058397')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.products[0], size=self.size, quantity=2)
+        set_favorite(user.id, self.products[1].id, True)
+
+        # Сессия уже принадлежит пользователю: сессия, каталог (2), корзина, избранное
+        with self.assertNumQueries(5):
+            response = self.post(init_data)
+        data = response.json()
+        self.assertEqual(data['cart']['total_quantity'], 2)
+        self.assertEqual(data['favorite_ids'], [self.products[1].id])
+
+        # Вернувшийся пользователь с новой сессией и холодным кэшем каталога
+        cache.clear()
+        self.client = self.client_class()
+        response = self.post(init_data)
+        self.assertQueryBudget(response)
+        self.assertEqual(response.json()['favorite_ids'], [self.products[1].id])
+
+    def test_next_page(self):
+        init_data = InitDataBenchmark.make_init_data('123456:TEST-TOKEN')
+        response = self.client.post(
+            f'{self.url}?category=shoes&page_size=2', {'init_data': init_data}, content_type='application/json'
+        )
+        products = response.json()['products']
+        self.assertEqual(len(products['results']), 2)
+
+        # Ссылка ведёт в каталог API с теми же фильтрами
+        next_url = urlsplit(products['next'])
+        self.assertEqual(next_url.path, '/api/products/')
+        self.assertEqual(dict(parse_qsl(next_url.query))['category'], 'shoes')
+
+        response = self.client.get(products['next'])
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual([item['id'] for item in page['results']], [self.products[0].id])
+        self.assertIsNone(page['next'])
+
+
+class OrderListAPITests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        product = Product.objects.create(
+            category=category, name='Товар', slug='product', description='', price=100, image='products/1.jpg',
+        )
+        cls.user = User.objects.create_user('buyer')
+        orders = Order.objects.bulk_create([Order(user=cls.user, total=100) for _ in range(25)])
+        OrderItem.objects.bulk_create([OrderItem(order=order, product=product, quantity=1, price=100) for order in orders])
+
+    def test_pages(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/orders/')
+        self.assertQueryBudget(response)
+        data = response.json()
+        self.assertEqual(len(data['results']), 20)
+        self.assertEqual(data['results'][0]['items'][0]['name'], 'Товар')
+
+        response = self.client.get(data['next'])
+        self.assertQueryBudget(response)
+        self.assertEqual(len(response.json()['results']), 5)
@@ -1,17 +1,25 @@
 from django.urls import path
 from .views import (ProductListAPI,
+                    ProductSearchAPI,
                     ProductDetailAPI,
                     CartAPI,
                     AddToCartAPI,
+                    CartBatchAPI,
+                    OrderListAPI,
                     CheckoutAPI,
-                    TelegramAuthView
+                    TelegramAuthView,
+                    BootstrapAPI
                     )
 
 urlpatterns = [
     path('products/', ProductListAPI.as_view(), name='api_product_list'),
+    path('products/search/', ProductSearchAPI.as_view(), name='api_product_search'),
     path('products/<int:pk>/', ProductDetailAPI.as_view(), name='api_product_detail'),
     path('cart/', CartAPI.as_view(), name='api_cart_list'),
     path('cart/add/', AddToCartAPI.as_view(), name='api_cart_add'),
+    path('cart/batch/', CartBatchAPI.as_view(), name='api_cart_batch'),
+    path('orders/', OrderListAPI.as_view(), name='api_order_list'),
     path('checkout/', CheckoutAPI.as_view(), name='api_checkout'),
     path('auth/', TelegramAuthView.as_view(), name='telegram-auth'),
+    path('bootstrap/', BootstrapAPI.as_view(), name='api_bootstrap'),
 ]
\ No newline at end of file
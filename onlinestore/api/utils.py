@@ -1,41 +1,87 @@
 import hashlib
 import hmac
+import json
+import time
+from functools import lru_cache
 from operator import itemgetter
-from typing import Callable, Any, Dict
+from typing import Callable, Any, Dict, Optional
 from urllib.parse import parse_qsl
 
 
-def check_webapp_signature(token: str, init_data: str) -> bool:
-    try:
-        parsed_data = dict(parse_qsl(init_data))
-    except ValueError:
-        return False
-    if "hash" not in parsed_data:
-        return False
+class WebAppInitDataVerifier:
+    """
+    Проверка initData Telegram Mini App.
 
-    hash_ = parsed_data.pop('hash')
-    data_check_string = "\n".join(
-        f"{k}={v}" for k, v in sorted(parsed_data.items(), key=itemgetter(0))
-    )
-    secret_key = hmac.new(
-        key=b"WebAppData", msg=token.encode(), digestmod=hashlib.sha256
-    )
-    calculated_hash = hmac.new(
-        key=secret_key.digest(), msg=data_check_string.encode(), digestmod=hashlib.sha256
-    ).hexdigest()
-    return calculated_hash == hash_
+    Секрет HMAC(b"WebAppData", token) считается один раз на токен, строка
+    разбирается один раз, подпись сравнивается за постоянное время.
+    """
 
+    def __init__(self, token: str, max_age: Optional[int] = None):
+        self.secret_key = hmac.new(
+            key=b"WebAppData", msg=token.encode(), digestmod=hashlib.sha256
+        ).digest()
+        self.max_age = max_age
 
-def parse_init_data(init_data: str, _loads: Callable[..., Any]) -> Dict[str, Any]:
+    def check_signature(self, parsed_data: Dict[str, str]) -> bool:
+        """Проверяет подпись; `parsed_data` — пары из initData без изменений"""
+        hash_ = parsed_data.get('hash')
+        if hash_ is None:
+            return False
+        data_check_string = "\n".join(
+            f"{k}={v}" for k, v in sorted(parsed_data.items(), key=itemgetter(0)) if k != 'hash'
+        )
+        calculated_hash = hmac.new(
+            key=self.secret_key, msg=data_check_string.encode(), digestmod=hashlib.sha256
+        ).hexdigest()
+        # Байты, а не str: compare_digest не сравнивает строки с не-ASCII символами
+        return hmac.compare_digest(calculated_hash.encode(), hash_.encode())
+
+    def verify(self, init_data: str, _loads: Callable[..., Any] = json.loads) -> Dict[str, Any]:
+        """Возвращает разобранные данные или бросает ValueError"""
+        try:
+            parsed_data = dict(parse_qsl(init_data))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid init data")
+
+        if not self.check_signature(parsed_data):
+            raise ValueError("Invalid init data signature")
+
+        if self.max_age is not None:
+            try:
+                auth_date = int(parsed_data['auth_date'])
+            except (KeyError, ValueError):
+                raise ValueError("Invalid init data auth_date")
+            if time.time() - auth_date > self.max_age:
+                raise ValueError("Init data is expired")
+
+        return decode_init_data(parsed_data, _loads)
+
+
+@lru_cache(maxsize=8)
+def get_webapp_verifier(token: str, max_age: Optional[int] = None) -> WebAppInitDataVerifier:
+    return WebAppInitDataVerifier(token, max_age)
+
+
+def decode_init_data(parsed_data: Dict[str, str], _loads: Callable[..., Any]) -> Dict[str, Any]:
     result = {}
-    for key, value in parse_qsl(init_data):
+    for key, value in parsed_data.items():
         if (value.startswith('[') and value.endswith(']')) or (value.startswith('{') and value.endswith('}')):
             value = _loads(value)
         result[key] = value
     return result
 
 
+def check_webapp_signature(token: str, init_data: str) -> bool:
+    try:
+        parsed_data = dict(parse_qsl(init_data))
+    except ValueError:
+        return False
+    return get_webapp_verifier(token).check_signature(parsed_data)
+
+
+def parse_init_data(init_data: str, _loads: Callable[..., Any]) -> Dict[str, Any]:
+    return decode_init_data(dict(parse_qsl(init_data)), _loads)
+
+
 def safe_parse_webapp_init_data(token: str, init_data: str, _loads: Callable[..., Any]) -> Dict[str, Any]:
-    if check_webapp_signature(token, init_data):
-        return parse_init_data(init_data, _loads)
-    raise ValueError("Invalid init data signature")
+    return get_webapp_verifier(token).verify(init_data, _loads)
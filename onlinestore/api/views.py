@@ -1,29 +1,38 @@
+import hashlib
 import json
 import logging
 
 from django.conf import settings
-from django.http.response import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.http.response import HttpResponseNotModified, JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic.base import View
-from django.contrib.auth import login
-from django.contrib.auth.models import User
-from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch
 
 from rest_framework.views import APIView
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework import status, permissions
+from rest_framework import exceptions, status, permissions
+from rest_framework.utils import encoders
 from rest_framework.authentication import SessionAuthentication
 
 from shop.models import (
     Product, Cart, CartItem, ProductSize, Size,
-    Order, OrderItem, TelegramUser
+    Order
+)
+from shop.facets import apply_filters, get_facets, get_filters
+from shop.search import search_products
+from shop.services import (
+    get_favorite_ids, place_order, update_cart, EmptyCartError, InvalidCartOperation, OutOfStockError
 )
 from .serializers import (
-    ProductSerializer, CartItemSerializer
+    ProductSerializer, CartLineSerializer, CartOperationSerializer, CartBatchSerializer, OrderSerializer
 )
-
-from .utils import safe_parse_webapp_init_data
+from .pagination import OrderCursorPagination, ProductCursorPagination, ProductSearchPagination
+from .auth import telegram_login
+from .utils import get_webapp_verifier
 
 
 logger = logging.getLogger(__name__)
@@ -31,64 +40,226 @@ logger = logging.getLogger(__name__)
 
 # ---------- 🛒 Продукты ----------
 
+def api_response(data, status=200):
+    """
+    JSON-ответ асинхронного представления в том же виде, что у JSONRenderer DRF.
+
+    APIView DRF не поддерживает async def, поэтому async-версии горячих
+    эндпоинтов (только для ASGI, см. onlinestore/urls_asgi.py) — обычные
+    представления Django.
+    """
+    return JsonResponse(
+        data, status=status, encoder=encoders.JSONEncoder,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+def product_queryset():
+    """
+    Доступные товары с размерами, загруженными двумя запросами на всю выборку.
+
+    search_vector нужен только в WHERE поиска и в ответ не попадает.
+    """
+    return Product.objects.filter(available=True).defer('search_vector').prefetch_related(
+        Prefetch('product_sizes', queryset=ProductSize.objects.select_related('size'))
+    )
+
+
+def product_list_data(request, view=None, base_url=None):
+    """
+    Страница каталога с фасетами; `request` — Request DRF.
+
+    ?category=<slug>&gender=&size=<id>&price=<диапазон>; неизвестные значения игнорируются.
+    `base_url` — адрес для ссылок next/previous, если страница отдаётся не
+    с /api/products/ (по умолчанию — адрес текущего запроса).
+    """
+    filters = get_filters(request.query_params)
+    paginator = ProductCursorPagination()
+    page = paginator.paginate_queryset(apply_filters(product_queryset(), filters), request, view=view)
+    if base_url:
+        # Параметры фильтра переносятся в ссылки, курсор добавит пагинатор
+        query = request.query_params.urlencode()
+        paginator.base_url = f'{base_url}?{query}' if query else base_url
+    serializer = ProductSerializer(page, many=True, context={'request': request})
+    data = paginator.get_paginated_response(serializer.data).data
+    data['facets'] = get_facets(filters)
+    return data
+
+
 class ProductListAPI(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
-        products = Product.objects.filter(available=True)
-        serializer = ProductSerializer(products, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(product_list_data(request, view=self))
+
+
+class ProductSearchAPI(APIView):
+    permission_classes = [permissions.AllowAny]
+    pagination_class = ProductSearchPagination
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'message': 'Пустой поисковый запрос'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(search_products(query, product_queryset()), request, view=self)
+        serializer = ProductSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ProductDetailAPI(APIView):
     permission_classes = [permissions.AllowAny]
 
-    def get(self, request, id):
-        product = get_object_or_404(Product, id=id, available=True)
+    def get(self, request, pk):
+        product = get_object_or_404(product_queryset(), pk=pk)
         serializer = ProductSerializer(product, context={'request': request})
         return Response(serializer.data)
 
 
+class AsyncProductDetailAPI(View):
+    """Карточка товара для ASGI (асинхронное представление, async ORM)"""
+
+    async def get(self, request, pk):
+        product = await product_queryset().filter(pk=pk).afirst()
+        if product is None:
+            return api_response({'detail': exceptions.NotFound.default_detail}, status=status.HTTP_404_NOT_FOUND)
+        return api_response(ProductSerializer(product, context={'request': request}).data)
+
+
 # ---------- 🛍 Корзина ----------
 
+def cart_items(user):
+    """Позиции корзины с итогами по строкам одним запросом (корзины может и не быть)"""
+    return (
+        CartItem.objects.filter(cart__user=user)
+        .with_line_totals()
+        .defer('product__description', 'product__search_vector')
+        .order_by('id')
+    )
+
+
+def cart_payload(items, request=None):
+    return {
+        'items': CartLineSerializer(items, many=True, context={'request': request}).data,
+        'total_price': sum(item.line_total for item in items),
+        'total_quantity': sum(item.quantity for item in items),
+    }
+
+
+def cart_response_data(user, request=None):
+    """`user` — пользователь или его id"""
+    return cart_payload(list(cart_items(user)), request)
+
+
+def cart_etag(data):
+    return '"{}"'.format(hashlib.md5(
+        json.dumps(data, cls=encoders.JSONEncoder, sort_keys=True).encode()
+    ).hexdigest())
+
+
+def with_cart_headers(response, etag):
+    response['ETag'] = etag
+    # Ответ зависит от пользователя: без общих кэшей и с обязательной перепроверкой
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 class CartAPI(APIView):
+    """
+    Корзина пользователя.
+
+    ETag считается по содержимому ответа: если корзина не менялась и клиент
+    прислал If-None-Match, отдаётся 304 без тела.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        items = CartItem.objects.filter(cart=cart)
-        serializer = CartItemSerializer(items, many=True)
-        return Response(serializer.data)
+        data = cart_response_data(request.user, request)
+        etag = cart_etag(data)
+        if etag in request.headers.get('If-None-Match', ''):
+            return with_cart_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        return with_cart_headers(Response(data), etag)
+
+
+class AsyncCartAPI(View):
+    """Корзина пользователя для ASGI (асинхронное представление, async ORM), ответы как у CartAPI"""
+
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return api_response(
+                {'detail': exceptions.NotAuthenticated.default_detail}, status=status.HTTP_403_FORBIDDEN
+            )
+
+        data = cart_payload([item async for item in cart_items(user)], request)
+        etag = cart_etag(data)
+        if etag in request.headers.get('If-None-Match', ''):
+            return with_cart_headers(HttpResponseNotModified(), etag)
+        return with_cart_headers(api_response(data), etag)
 
 
 class AddToCartAPI(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        product_id = request.data.get('product_id')
-        size_id = request.data.get('size_id')
-        quantity = int(request.data.get('quantity', 1))
+        data = {key: request.data[key] for key in ('product_id', 'size_id', 'quantity') if key in request.data}
+        serializer = CartOperationSerializer(data={**data, 'op': 'add'})
+        serializer.is_valid(raise_exception=True)
 
-        product = get_object_or_404(Product, id=product_id)
-        size = get_object_or_404(ProductSize, id=size_id)
-
-        product_size = get_object_or_404(ProductSize, product=product, size=size)
-        if product_size.quantity < quantity:
+        try:
+            update_cart(request.user, [serializer.validated_data])
+        except InvalidCartOperation:
+            return Response({'message': 'Товар не найден'}, status=status.HTTP_404_NOT_FOUND)
+        except OutOfStockError:
             return Response({'message': 'Недостаточно товара'}, status=status.HTTP_400_BAD_REQUEST)
 
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            size=size,
-            defaults={'quantity': quantity}
-        )
+        return Response({'success': True})
 
-        if not created:
-            item.quantity += quantity
-            item.save()
 
-        return Response({'success': True})
+class CartBatchAPI(APIView):
+    """
+    Пачка изменений корзины одним запросом.
+
+    {"operations": [{"op": "add" | "update" | "remove", "product_id": 1,
+    "size_id": 2, "quantity": 1}, ...]} — применяются все или ни одна.
+    В ответе — итоговая корзина.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            update_cart(request.user, serializer.validated_data['operations'])
+        except InvalidCartOperation as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except OutOfStockError as e:
+            return Response({
+                'message': str(e),
+                'items': [
+                    {'product_id': item.product_id, 'size_id': item.size_id, 'requested': item.quantity}
+                    for item in e.items
+                ],
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response(cart_response_data(request.user, request))
+
+
+# ---------- 📦 Заказы ----------
+
+class OrderListAPI(APIView):
+    """История заказов пользователя с позициями: два запроса на страницу"""
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
+
+    def get(self, request):
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            Order.objects.filter(user=request.user).with_items(), request, view=self
+        )
+        return paginator.get_paginated_response(OrderSerializer(page, many=True).data)
 
 
 # ---------- 📦 Оформление заказа ----------
@@ -109,32 +280,20 @@ class CheckoutAPI(APIView):
             logger.warning("Пользователь не аутентифицирован!")
             return Response({'message': 'Пользователь не аутентифицирован'}, status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            cart = get_object_or_404(Cart, user=request.user)
-        except Exception as e:
-            logger.error(f"Корзина не найдена для пользователя {request.user}: {e}")
-            return Response({'message': 'Корзина не найдена'}, status=status.HTTP_404_NOT_FOUND)
-
-        if not cart.items.exists():
-            logger.info("Корзина пуста")
-            return Response({'message': 'Корзина пуста'}, status=status.HTTP_400_BAD_REQUEST)
-
         comment = request.data.get('comment', '')
         logger.debug(f"Комментарий к заказу: {comment}")
 
         try:
-            total = sum(item.product.price * item.quantity for item in cart.items.all())
-            order = Order.objects.create(user=request.user, total=total, comment=comment)
-
-            for item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    size=item.size,
-                    quantity=item.quantity,
-                    price=item.product.price
-                )
-            cart.items.all().delete()
+            order = place_order(request.user, comment)
+        except Cart.DoesNotExist:
+            logger.error(f"Корзина не найдена для пользователя {request.user}")
+            return Response({'message': 'Корзина не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        except EmptyCartError:
+            logger.info("Корзина пуста")
+            return Response({'message': 'Корзина пуста'}, status=status.HTTP_400_BAD_REQUEST)
+        except OutOfStockError as e:
+            logger.info(f"Недостаточно остатков: {e}")
+            return Response({'message': str(e)}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             logger.error(f"Ошибка при создании заказа: {e}")
             return Response({'message': 'Ошибка оформления заказа'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -144,57 +303,71 @@ class CheckoutAPI(APIView):
 
 
 
-@method_decorator(csrf_exempt, name='dispatch')
-class TelegramAuthView(View):
-    def post(self, request, *args, **kwargs):
-        print("POST /api/auth/ получен!")
-        try:
-            body = json.loads(request.body)
-            init_data = body.get("init_data")
-        except (json.JSONDecodeError, AttributeError):
-            return JsonResponse({"error": "Invalid JSON"}, status=400)
+def login_from_init_data(request):
+    """
+    Проверяет initData Mini App из тела POST {"init_data": "..."} и логинит
+    пользователя. Возвращает (user_data, id пользователя) или JsonResponse с ошибкой.
+    """
+    try:
+        body = json.loads(request.body)
+        init_data = body.get("init_data")
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
 
-        bot_token = settings.TELEGRAM_BOT_TOKEN
+    verifier = get_webapp_verifier(settings.TELEGRAM_BOT_TOKEN, settings.TELEGRAM_INIT_DATA_MAX_AGE)
 
-        try:
-            parsed = safe_parse_webapp_init_data(bot_token, init_data, json.loads)
-        except ValueError as e:
-            print("Signature validation failed:", e)
-            return JsonResponse({"error": "Invalid signature"}, status=403)
-
-        user_data = parsed.get("user")
-        telegram_id = user_data['id']
-        username = user_data.get('username')
-        first_name = user_data.get('first_name')
-        last_name = user_data.get('last_name')
-
-        tg_user, created = TelegramUser.objects.get_or_create(
-            telegram_id=telegram_id,
-            defaults={
-                "username": username,
-                "first_name": first_name,
-                "last_name": last_name,
-            }
-        )
+    try:
+        parsed = verifier.verify(init_data)
+    except ValueError as e:
+        logger.info(f"initData не прошла проверку: {e}")
+        return JsonResponse({"error": "Invalid signature"}, status=403)
 
-        if tg_user.user is None:
-            base_username = f"tg_{telegram_id}"
-            user = User.objects.create_user(
-                username=base_username,
-                first_name=first_name,
-                last_name=last_name,
-                password=str(telegram_id) + last_name + str(telegram_id)
-            )
-            tg_user.user = user
-            tg_user.save()
-        else:
-            user = tg_user.user
+    user_data = parsed.get("user")
+    if not user_data:
+        return JsonResponse({"error": "No user in init data"}, status=400)
+
+    return user_data, telegram_login(request, user_data)
 
-        user.backend = 'django.contrib.auth.backends.ModelBackend'
-        login(request, user)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class TelegramAuthView(View):
+    def post(self, request, *args, **kwargs):
+        result = login_from_init_data(request)
+        if isinstance(result, JsonResponse):
+            return result
+        user_data, _ = result
 
         return JsonResponse({
             "ok": True,
-            "user": parsed.get("user"),
+            "user": user_data,
             "redirect_url": "/"}
         )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BootstrapAPI(View):
+    """
+    Всё, что нужно Mini App для первого экрана, одним запросом: вход по
+    initData, первая страница каталога (параметры фильтра — в query string,
+    как у /api/products/), корзина и id избранных товаров.
+
+    Корзина и избранное читаются по id пользователя, сам User не загружается.
+    """
+
+    def post(self, request, *args, **kwargs):
+        result = login_from_init_data(request)
+        if isinstance(result, JsonResponse):
+            return result
+        user_data, user_id = result
+
+        drf_request = Request(request)
+        return api_response({
+            'ok': True,
+            'user': user_data,
+            # Следующие страницы Mini App берёт с /api/products/, а не повторным входом
+            'products': product_list_data(
+                drf_request, base_url=request.build_absolute_uri(reverse('api_product_list'))
+            ),
+            'cart': cart_response_data(user_id, drf_request),
+            'favorite_ids': sorted(get_favorite_ids(user_id)),
+        })
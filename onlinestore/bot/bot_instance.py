@@ -1,5 +1,9 @@
 from aiogram import Bot, Dispatcher
-from config import BOT_TOKEN
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from config import BOT_TOKEN, BOT_API_URL
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
\ No newline at end of file
+session = AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_URL)) if BOT_API_URL else None
+
+bot = Bot(token=BOT_TOKEN, session=session)
+dp = Dispatcher()
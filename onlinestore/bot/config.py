@@ -5,3 +5,33 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 API_BASE_URL = os.getenv("API_BASE_URL")
+
+# Сколько запросов к БД бот выполняет параллельно (по соединению на поток)
+DB_CONCURRENCY = int(os.getenv("BOT_DB_CONCURRENCY", 8))
+
+# Режим работы: "polling" или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Публичный адрес, например https://shop.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/bot/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+
+# Обработчики апдейтов и размер очереди между HTTP-приёмом и обработкой
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 16))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+# Сколько ждать места в очереди, прежде чем ответить 503 (Telegram повторит доставку)
+WEBHOOK_ENQUEUE_TIMEOUT = float(os.getenv("WEBHOOK_ENQUEUE_TIMEOUT", 2))
+# Сколько при остановке дообрабатывать уже принятые апдейты
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 30))
+
+# Адрес Bot API (например, локальный сервер для тестов); по умолчанию api.telegram.org
+BOT_API_URL = os.getenv("BOT_API_URL")
+
+# Рассылка уведомлений: общий лимит Telegram ~30 сообщений/с и ~1 сообщение/с в один чат
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", 30))
+NOTIFY_CHAT_RATE = float(os.getenv("NOTIFY_CHAT_RATE", 1))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", 100))
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", 2))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", 5))
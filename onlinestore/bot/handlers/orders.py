@@ -1,20 +1,14 @@
 from aiogram import Router, types, F
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-router = Router()
+from bot.repository import get_active_orders, get_completed_orders
 
-async def get_active_orders(user_id):
-    return [
-        {"id": 1234, "status": "В пути"},
-        {"id": 1235, "status": "Ожидает оплату"}
-    ]
+router = Router()
 
-@router.callback_query(F.data == "active_orders")
-async def show_active_orders(callback_query: types.CallbackQuery):
-    orders = await get_active_orders(callback_query.from_user.id)
 
+async def send_orders(callback_query: types.CallbackQuery, orders, empty_text):
     if not orders:
-        await callback_query.message.answer("У вас нет активных заказов.")
+        await callback_query.message.answer(empty_text)
     else:
         text = "\n\n".join(
             [f"🛍 Заказ #{order['id']}\n📦 Статус: {order['status']}" for order in orders]
@@ -26,3 +20,14 @@ async def show_active_orders(callback_query: types.CallbackQuery):
 
     await callback_query.answer()
 
+
+@router.callback_query(F.data == "active_orders")
+async def show_active_orders(callback_query: types.CallbackQuery):
+    orders = await get_active_orders(callback_query.from_user.id)
+    await send_orders(callback_query, orders, "У вас нет активных заказов.")
+
+
+@router.callback_query(F.data == "completed_orders")
+async def show_completed_orders(callback_query: types.CallbackQuery):
+    orders = await get_completed_orders(callback_query.from_user.id)
+    await send_orders(callback_query, orders, "У вас нет завершённых заказов.")
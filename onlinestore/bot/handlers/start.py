@@ -1,25 +1,16 @@
 from aiogram import Router, types, F
 from aiogram.filters import CommandStart
 from aiogram.types import LabeledPrice
-from shop.models import Order, TelegramUser
 from bot.bot_instance import bot
+from bot.repository import get_order_and_tg_user
 from keyboards.main import main_menu, orders_menu
 
 from django.core.exceptions import ObjectDoesNotExist
 
-from asgiref.sync import sync_to_async
-
 
 router = Router()
 
 
-@sync_to_async
-def get_order_and_tg_user(order_id):
-    order = Order.objects.get(id=order_id)
-    tg_user = TelegramUser.objects.get(user=order.user)
-    return order, tg_user
-
-
 @router.message(CommandStart())
 async def handle_deeplink_start(message: types.Message):
     args = ""
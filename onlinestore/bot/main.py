@@ -13,12 +13,22 @@ django.setup()
 
 
 from bot_instance import bot, dp
+from config import BOT_MODE
 from handlers import start, orders
+from notifications import NotificationDispatcher
+from webhook import run_webhook
 
 dp.include_routers(
     start.router,
     orders.router,
 )
 
+notifier = NotificationDispatcher(bot)
+dp.startup.register(notifier.start)
+dp.shutdown.register(notifier.stop)
+
 if __name__ == '__main__':
-    asyncio.run(dp.start_polling(bot))
+    if BOT_MODE == 'webhook':
+        run_webhook(bot, dp)
+    else:
+        asyncio.run(dp.start_polling(bot))
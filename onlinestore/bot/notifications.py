@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from bot.config import (
+    NOTIFY_RATE,
+    NOTIFY_CHAT_RATE,
+    NOTIFY_BATCH_SIZE,
+    NOTIFY_POLL_INTERVAL,
+    NOTIFY_MAX_ATTEMPTS,
+)
+from bot.repository import claim_notifications, notification_queue, save_notification_results
+
+
+logger = logging.getLogger(__name__)
+
+# На сколько секунд забранная пачка скрыта от других отправителей
+LEASE_SECONDS = 120
+
+
+class TokenBucket:
+    """Token bucket: не больше `rate` событий в секунду со всплеском до `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Забирает токены так, чтобы следующая отправка была не раньше чем через `seconds`"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class NotificationDispatcher:
+    """
+    Рассылает уведомления из таблицы Notification.
+
+    Забирает пачки из БД, отправляет их параллельно с общим лимитом и лимитом
+    на чат, а результаты пачки записывает двумя запросами. При RetryAfter
+    рассылка приостанавливается на указанное Telegram время, при прочих
+    ошибках сообщение откладывается с экспоненциальной задержкой.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.global_bucket = TokenBucket(NOTIFY_RATE)
+        self.chat_buckets = {}
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def run(self):
+        while True:
+            try:
+                sent = await self.dispatch_batch()
+            except Exception:
+                logger.exception("Ошибка рассылки уведомлений")
+                sent = 0
+            if not sent:
+                await asyncio.sleep(NOTIFY_POLL_INTERVAL)
+
+    async def dispatch_batch(self) -> int:
+        notifications = await claim_notifications(NOTIFY_BATCH_SIZE, LEASE_SECONDS)
+        if not notifications:
+            return 0
+
+        results = await asyncio.gather(*(self.send(n) for n in notifications))
+        sent_ids = [n.id for n, ok in zip(notifications, results) if ok]
+        retried = [n for n, ok in zip(notifications, results) if not ok]
+        await save_notification_results(sent_ids, retried)
+        self._forget_idle_chats()
+        return len(notifications)
+
+    def _chat_bucket(self, chat_id):
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(NOTIFY_CHAT_RATE, 1)
+        return self.chat_buckets[chat_id]
+
+    def _forget_idle_chats(self):
+        now = time.monotonic()
+        self.chat_buckets = {
+            chat_id: bucket for chat_id, bucket in self.chat_buckets.items()
+            if now - bucket.updated < 60
+        }
+
+    async def send(self, notification) -> bool:
+        chat_bucket = self._chat_bucket(notification.chat_id)
+        await chat_bucket.acquire()
+        await self.global_bucket.acquire()
+        try:
+            await self.bot.send_message(notification.chat_id, notification.text)
+        except TelegramRetryAfter as e:
+            # Флуд-контроль касается всего бота: притормаживаем общую очередь
+            self.global_bucket.pause(e.retry_after)
+            notification_queue.retry(
+                notification, str(e), NOTIFY_MAX_ATTEMPTS, delay=e.retry_after, count_attempt=False
+            )
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Бот заблокирован или чат не существует — повторять бессмысленно
+            notification_queue.fail(notification, str(e))
+        except Exception as e:
+            notification_queue.retry(notification, str(e), NOTIFY_MAX_ATTEMPTS)
+        else:
+            return True
+        return False
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from shop.models import Notification, Order
+from shop.queue import LeasedQueue
+from bot.config import DB_CONCURRENCY
+
+
+ACTIVE_STATUSES = ('new', 'in_progres')
+COMPLETED_STATUSES = ('completed',)
+
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+_executor = ThreadPoolExecutor(max_workers=DB_CONCURRENCY, thread_name_prefix='bot-db')
+
+notification_queue = LeasedQueue(Notification, 'sent', 'sent_at', base_delay=5, max_delay=60 * 30)
+
+
+def database(func):
+    """
+    Делает из синхронной ORM-функции корутину.
+
+    По умолчанию sync_to_async (и async-ORM Django, который построен на нём)
+    выполняет все запросы в одном потоке, и апдейты бота встают в очередь к БД.
+    Здесь запросы идут в пул из DB_CONCURRENCY потоков, у каждого своё соединение.
+    """
+    @wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        return func(*args, **kwargs)
+
+    return sync_to_async(run, thread_sensitive=False, executor=_executor)
+
+
+@database
+def get_order_and_tg_user(order_id):
+    """Заказ и Telegram-пользователь владельца одним запросом с JOIN"""
+    order = Order.objects.select_related('user__telegram_user').get(id=order_id)
+    return order, order.user.telegram_user
+
+
+@database
+def get_user_orders(telegram_id, statuses):
+    orders = (
+        Order.objects
+        .filter(user__telegram_user__telegram_id=telegram_id, status__in=statuses)
+        .order_by('-created_at')
+        .values('id', 'status', 'total', 'created_at')
+    )
+    return [{**order, 'status': STATUS_LABELS[order['status']]} for order in orders]
+
+
+async def get_active_orders(telegram_id):
+    return await get_user_orders(telegram_id, ACTIVE_STATUSES)
+
+
+async def get_completed_orders(telegram_id):
+    return await get_user_orders(telegram_id, COMPLETED_STATUSES)
+
+
+@database
+def claim_notifications(limit, lease):
+    return notification_queue.claim(limit, lease)
+
+
+@database
+def save_notification_results(sent_ids, retried):
+    notification_queue.save_results(sent_ids, retried)
@@ -0,0 +1,132 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, mock
+
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot import webhook
+from bot.notifications import NotificationDispatcher
+from shop.models import Notification
+
+
+def make_update(update_id, text='/start'):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': 1, 'type': 'private'},
+            'text': text,
+        },
+    }
+
+
+class WebhookTests(IsolatedAsyncioTestCase):
+    """Синтетические апдейты через тестовый клиент aiohttp, без обращений к Telegram"""
+
+    async def asyncSetUp(self):
+        patcher = mock.patch.multiple(
+            webhook,
+            WEBHOOK_URL=None,
+            WEBHOOK_PATH='/bot/webhook',
+            WEBHOOK_SECRET='secret',
+            WEBHOOK_WORKERS=1,
+            WEBHOOK_QUEUE_SIZE=1,
+            WEBHOOK_ENQUEUE_TIMEOUT=0.05,
+            WEBHOOK_DRAIN_TIMEOUT=5,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.handled = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+        dp = Dispatcher()
+
+        @dp.message()
+        async def handler(message):
+            await self.release.wait()
+            self.handled.append(message.message_id)
+
+        self.client = TestClient(TestServer(webhook.create_app(Bot('42:TEST'), dp)))
+        await self.client.start_server()
+        self.updates = self.client.app['updates']
+
+    async def asyncTearDown(self):
+        self.release.set()
+        await self.client.close()
+
+    async def post(self, update, secret='secret'):
+        response = await self.client.post(
+            '/bot/webhook', json=update, headers={'X-Telegram-Bot-Api-Secret-Token': secret}
+        )
+        return response.status
+
+    async def test_wrong_secret(self):
+        self.assertEqual(await self.post(make_update(1), secret='wrong'), 403)
+        self.assertEqual(await self.post(make_update(1), secret=''), 403)
+        self.assertEqual(self.updates.queue.qsize(), 0)
+
+    async def test_update_processed(self):
+        self.assertEqual(await self.post(make_update(1)), 200)
+        await asyncio.wait_for(self.updates.queue.join(), 5)
+        self.assertEqual(self.handled, [1])
+
+    async def test_full_queue(self):
+        self.release.clear()
+        # Первый апдейт занял обработчик, второй — единственное место в очереди
+        self.assertEqual(await self.post(make_update(1)), 200)
+        await asyncio.sleep(0)
+        self.assertEqual(await self.post(make_update(2)), 200)
+        self.assertEqual(await self.post(make_update(3)), 503)
+
+        self.release.set()
+        await asyncio.wait_for(self.updates.queue.join(), 5)
+        self.assertEqual(self.handled, [1, 2])
+
+    async def test_drain_on_shutdown(self):
+        self.release.clear()
+        self.assertEqual(await self.post(make_update(1)), 200)
+        await asyncio.sleep(0)
+        self.assertEqual(await self.post(make_update(2)), 200)
+
+        # Остановка ждёт, пока очередь дообработается
+        shutdown = asyncio.create_task(self.client.close())
+        await asyncio.sleep(0.05)
+        self.assertFalse(shutdown.done())
+        self.assertFalse(await self.updates.put(make_update(3), 0))
+        self.release.set()
+        await asyncio.wait_for(shutdown, 5)
+
+        self.assertEqual(self.handled, [1, 2])
+        self.assertTrue(all(task.done() for task in self.updates._tasks))
+
+
+class NotificationDispatcherTests(IsolatedAsyncioTestCase):
+    """Исход отправки записывается в уведомление; в БД его сохраняет save_notification_results"""
+
+    async def test_send_outcomes(self):
+        errors = {
+            2: RuntimeError('timeout'),
+            3: TelegramForbiddenError(mock.Mock(), 'blocked'),
+            4: TelegramRetryAfter(mock.Mock(), 'flood', retry_after=1),
+        }
+
+        async def send_message(chat_id, text):
+            if chat_id in errors:
+                raise errors[chat_id]
+
+        dispatcher = NotificationDispatcher(mock.Mock(send_message=send_message))
+        notifications = [Notification(chat_id=chat_id, text='Заказ принят') for chat_id in (1, 2, 3, 4)]
+        results = [await dispatcher.send(notification) for notification in notifications]
+        self.assertEqual(results, [True, False, False, False])
+
+        sent, retried, blocked, flood = notifications
+        self.assertEqual((retried.status, retried.attempts), ('pending', 1))
+        self.assertGreater(retried.next_attempt_at, flood.next_attempt_at)
+        self.assertEqual((blocked.status, blocked.last_error), ('failed', str(errors[3])))
+        # RetryAfter — ограничение Telegram, а не ошибка сообщения: попытка не считается
+        self.assertEqual((flood.status, flood.attempts), ('pending', 0))
+        self.assertIsNone(flood.sent_at)
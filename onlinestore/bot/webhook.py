@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import secrets
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+
+from bot.config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_WORKERS,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_ENQUEUE_TIMEOUT,
+    WEBHOOK_DRAIN_TIMEOUT,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueue:
+    """
+    Ограниченная очередь апдейтов с пулом обработчиков.
+
+    HTTP-обработчик только кладёт апдейт в очередь и сразу отвечает Telegram,
+    а обработку ведут `workers` задач параллельно. Если очередь заполнена,
+    апдейт не принимается — Telegram доставит его повторно позже.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, workers: int, maxsize: int):
+        self.bot = bot
+        self.dp = dp
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.accepting = False
+        self._tasks = []
+
+    def start(self):
+        self.accepting = True
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def put(self, update: dict, timeout: float) -> bool:
+        if not self.accepting:
+            return False
+        try:
+            await asyncio.wait_for(self.queue.put(update), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_raw_update(self.bot, update)
+            except Exception:
+                logger.exception("Ошибка обработки апдейта %s", update.get("update_id"))
+            finally:
+                self.queue.task_done()
+
+    async def drain(self, timeout: float):
+        """Перестаёт принимать апдейты, дообрабатывает очередь и гасит обработчики"""
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Не обработано апдейтов при остановке: %s", self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def handle_update(request: web.Request) -> web.Response:
+    if WEBHOOK_SECRET and not secrets.compare_digest(
+        request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), WEBHOOK_SECRET
+    ):
+        return web.Response(status=403)
+
+    try:
+        update = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+
+    if not await request.app["updates"].put(update, WEBHOOK_ENQUEUE_TIMEOUT):
+        return web.Response(status=503)
+    return web.Response()
+
+
+def create_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    app = web.Application()
+    app["updates"] = UpdateQueue(bot, dp, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE)
+    app.router.add_post(WEBHOOK_PATH, handle_update)
+
+    async def on_startup(app):
+        await dp.emit_startup(bot=bot, dispatcher=dp, app=app)
+        app["updates"].start()
+        if WEBHOOK_URL:
+            await bot.set_webhook(
+                WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                max_connections=WEBHOOK_WORKERS,
+            )
+
+    async def on_shutdown(app):
+        # Вебхук не снимаем: пока бот перезапускается, Telegram копит апдейты у себя
+        await app["updates"].drain(WEBHOOK_DRAIN_TIMEOUT)
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, app=app)
+        await bot.session.close()
+
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+
+def run_webhook(bot: Bot, dp: Dispatcher):
+    web.run_app(create_app(bot, dp), host=WEBHOOK_HOST, port=WEBHOOK_PORT)
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'onlinestore.settings')
+# settings подключает async-представления (onlinestore.urls_asgi),
+# settings_production выключает постоянные соединения
+os.environ['DJANGO_ASGI'] = '1'
 
 application = get_asgi_application()
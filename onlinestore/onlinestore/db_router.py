@@ -0,0 +1,115 @@
+"""
+Чтение каталога с реплик PostgreSQL.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. С них читаются только
+модели каталога (REPLICA_READ_MODELS) — корзина, заказы, сессии и
+пользователи всегда идут в primary. Чтение тоже идёт в primary:
+
+* внутри транзакции на primary (запись и проверка остатков в одной транзакции);
+* внутри блока use_primary() — например, при заполнении общего кэша, чтобы
+  отставшая реплика не попала в кэш на весь таймаут;
+* в течение REPLICA_PIN_SECONDS после запроса пользователя, который что-то
+  менял (POST/PUT/PATCH/DELETE): иначе он может не увидеть свою запись.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = 'pin_primary'
+
+# None — реплику выбрать случайно; DEFAULT_DB_ALIAS — читать с primary
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    token = _read_alias.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not replicas() or model._meta.label_lower not in settings.REPLICA_READ_MODELS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get() or random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии primary, связи между объектами с разных алиасов допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Выбирает реплику на весь запрос (count и страница читаются с одной) и
+    закрепляет за primary пользователя, который только что что-то изменил.
+
+    Выбор хранится в ContextVar, поэтому доходит и до async ORM: sync_to_async
+    выполняет запросы с копией контекста.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+
+        token = _read_alias.set(self.read_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+
+        token = _read_alias.set(self.read_alias(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.process_response(request, response)
+
+    @staticmethod
+    def writes(request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS')
+
+    def read_alias(self, request):
+        if self.writes(request) or PIN_COOKIE in request.COOKIES:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def process_response(self, request, response):
+        if self.writes(request):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,226 @@
+"""
+Метрики запросов: число SQL-запросов, время в БД, общее время и размер ответа.
+
+MetricsMiddleware меряет каждый запрос, отдаёт результат заголовком
+Server-Timing и копит счётчики по представлениям; metrics_view выводит их в
+текстовом формате Prometheus. Счётчики живут в памяти процесса, поэтому при
+нескольких воркерах каждый отдаёт свои — Prometheus суммирует их по instance.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограммы длительности запроса, секунды
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class QueryStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка execute_wrapper: считает каждый запрос и его время
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+@contextmanager
+def measure():
+    """
+    Меряет запросы ко всем базам внутри блока.
+
+        with measure() as stats:
+            ...
+        stats.queries, stats.db_time, stats.duration
+    """
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        try:
+            yield stats
+        finally:
+            stats.duration = time.perf_counter() - stats.started
+
+
+@asynccontextmanager
+async def ameasure():
+    """
+    measure() для асинхронного кода.
+
+    Соединения привязаны к потоку, а async ORM выполняет запросы в потоке
+    sync_to_async, поэтому обёртки ставятся и снимаются в нём же.
+    """
+    stack = ExitStack()
+    stats = await sync_to_async(stack.enter_context)(measure())
+    try:
+        yield stats
+    finally:
+        await sync_to_async(stack.close)()
+
+
+class MetricsRegistry:
+    """Накопленные по представлениям счётчики (потокобезопасно)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view, method, status, stats, size):
+        with self.lock:
+            entry = self.views.setdefault((view, method), {
+                'statuses': {},
+                'count': 0,
+                'duration': 0.0,
+                'db_time': 0.0,
+                'queries': 0,
+                'bytes': 0,
+                'buckets': [0] * len(DURATION_BUCKETS),
+            })
+            entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+            entry['count'] += 1
+            entry['duration'] += stats.duration
+            entry['db_time'] += stats.db_time
+            entry['queries'] += stats.queries
+            entry['bytes'] += size
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if stats.duration <= bound:
+                    entry['buckets'][i] += 1
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus (каждое семейство — одной группой)"""
+        with self.lock:
+            views = sorted(self.views.items())
+            families = {
+                'http_requests_total counter': [],
+                'http_request_duration_seconds histogram': [],
+                'http_request_db_queries_total counter': [],
+                'http_request_db_duration_seconds_total counter': [],
+                'http_response_size_bytes_total counter': [],
+            }
+            requests, durations, queries, db_time, sizes = families.values()
+            for (view, method), entry in views:
+                labels = f'view="{view}",method="{method}"'
+                for status, count in sorted(entry['statuses'].items()):
+                    requests.append(f'http_requests_total{{{labels},status="{status}"}} {count}')
+                for bound, count in zip(DURATION_BUCKETS, entry['buckets']):
+                    durations.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                durations += [
+                    f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {entry["count"]}',
+                    f'http_request_duration_seconds_sum{{{labels}}} {entry["duration"]:.6f}',
+                    f'http_request_duration_seconds_count{{{labels}}} {entry["count"]}',
+                ]
+                queries.append(f'http_request_db_queries_total{{{labels}}} {entry["queries"]}')
+                db_time.append(f'http_request_db_duration_seconds_total{{{labels}}} {entry["db_time"]:.6f}')
+                sizes.append(f'http_response_size_bytes_total{{{labels}}} {entry["bytes"]}')
+
+        lines = []
+        for family, samples in families.items():
+            lines.append(f'# TYPE {family}')
+            lines += samples
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+def query_budget(view):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view)
+
+
+class MetricsMiddleware:
+    """
+    Меряет запрос и добавляет заголовок Server-Timing:
+
+        Server-Timing: db;dur=3.1;desc="5 queries", app;dur=12.4
+
+    Статистика также сохраняется в response.query_stats (для тестов).
+    Работает и в синхронной, и в асинхронной цепочке middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with measure() as stats:
+            response = self.get_response(request)
+        return self.process(request, response, stats)
+
+    async def __acall__(self, request):
+        async with ameasure() as stats:
+            response = await self.get_response(request)
+        return self.process(request, response, stats)
+
+    def process(self, request, response, stats):
+        view = view_name(request)
+        if view == 'metrics':
+            return response
+
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(view, request.method, response.status_code, stats, size)
+        response.query_stats = stats
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+            f'app;dur={stats.duration * 1000:.1f}'
+        )
+
+        budget = query_budget(view)
+        if budget is not None and stats.queries > budget:
+            logger.warning(f"{view}: {stats.queries} SQL-запросов при бюджете {budget}")
+        return response
+
+
+def metrics_view(request):
+    """Счётчики в формате Prometheus; доступ — с адресов из METRICS_ALLOWED_IPS"""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ()):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class QueryBudgetMixin:
+    """
+    Для TestCase: проверка, что представление уложилось в бюджет из QUERY_BUDGETS.
+
+        response = self.client.get('/api/cart/')
+        self.assertQueryBudget(response)
+    """
+
+    def assertQueryBudget(self, response):
+        request = getattr(response, 'wsgi_request', None) or response.asgi_request
+        view = view_name(request)
+        budget = query_budget(view)
+        if budget is None:
+            self.fail(f'Для {view} не задан бюджет в QUERY_BUDGETS')
+        self.assertLessEqual(
+            response.query_stats.queries, budget,
+            f'{view}: {response.query_stats.queries} SQL-запросов при бюджете {budget}'
+        )
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -48,6 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'onlinestore.metrics.MetricsMiddleware',
+    'onlinestore.db_router.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,7 +60,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'onlinestore.urls'
+# Под ASGI (onlinestore/asgi.py выставляет DJANGO_ASGI=1) горячие эндпоинты API — async-представления
+ROOT_URLCONF = 'onlinestore.urls_asgi' if os.getenv('DJANGO_ASGI') == '1' else 'onlinestore.urls'
 
 TEMPLATES = [
     {
@@ -91,6 +96,39 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения каталога (onlinestore.db_router): DB_REPLICA_HOSTS=host1,host2
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['onlinestore.db_router.PrimaryReplicaRouter']
+REPLICA_READ_MODELS = {'shop.category', 'shop.product', 'shop.size', 'shop.productsize'}
+REPLICA_PIN_SECONDS = 10  # сколько после изменений пользователь читает с primary
+
+
+# Cache
+# Redis, если задан REDIS_URL, иначе локальный кэш процесса (разработка и тесты)
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+CATALOG_CACHE_TIMEOUT = 60 * 15
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +176,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Фоновые задачи (manage.py run_tasks)
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', 4))
+TASK_RETENTION_DAYS = 7  # сколько хранить завершённые задачи и их ключи идемпотентности
+
 CSRF_TRUSTED_ORIGINS = [
     # (списка доверенных источников)
 ]
@@ -149,7 +191,35 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Метрики запросов (onlinestore.metrics): кому отдавать /metrics/ и
+# сколько SQL-запросов допустимо на представление (имя URL -> лимит)
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+QUERY_BUDGETS = {
+    # С холодным кэшем каталога; сессия и пользователь входят в бюджет,
+    # SAVEPOINT/RELEASE транзакций в тестах — тоже
+    'product_list': 9,
+    'product_list_by_category': 9,
+    'product_list_by_gender': 9,
+    'product_list_by_category_gender': 9,
+    'product_search': 7,
+    'product_detail': 5,
+    'cart_detail': 4,
+    'checkout': 10,
+    'order_list': 5,
+    'order_detail': 5,
+    'favorites': 4,
+    'api_product_list': 7,
+    'api_product_search': 6,
+    'api_product_detail': 3,
+    'api_cart_list': 3,
+    'api_cart_batch': 14,
+    'api_checkout': 16,
+    'api_order_list': 4,
+    'api_bootstrap': 16,  # вход с новой сессией; регистрация нового пользователя дороже
+}
+
 TELEGRAM_BOT_TOKEN = 'Token' # Токен телеграм бота
+TELEGRAM_INIT_DATA_MAX_AGE = 60 * 60 * 24 # Срок годности initData Mini App, секунды
 
 LOGGING = {
     'version': 1,
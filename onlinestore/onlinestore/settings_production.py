@@ -0,0 +1,67 @@
+"""
+Настройки для продакшена: DJANGO_SETTINGS_MODULE=onlinestore.settings_production.
+
+Всё, что зависит от окружения, читается из переменных окружения. Запуск:
+
+    gunicorn onlinestore.wsgi --workers 4 --threads 8      # WSGI
+    uvicorn onlinestore.asgi:application --workers 4       # ASGI
+
+Соединения с PostgreSQL:
+
+* WSGI — постоянные соединения: поток держит соединение DB_CONN_MAX_AGE
+  секунд, а перед каждым запросом проверяет его (CONN_HEALTH_CHECKS), так что
+  оборванное соединение заменяется новым, а не роняет запрос;
+* ASGI — синхронный код каждого запроса выполняется в своём потоке, и
+  постоянные соединения копились бы по числу потоков. Поэтому asgi.py их
+  выключает: соединения берутся из пула (DB_POOL_MAX_SIZE, нужен psycopg 3
+  с psycopg-pool) или из PgBouncer перед базой.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+
+DEBUG = os.getenv('DJANGO_DEBUG') == '1'
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+ALLOWED_HOSTS = os.environ['DJANGO_ALLOWED_HOSTS'].split(',')
+CSRF_TRUSTED_ORIGINS = [origin for origin in os.getenv('DJANGO_CSRF_TRUSTED_ORIGINS', '').split(',') if origin]
+
+ASGI = os.getenv('DJANGO_ASGI') == '1'  # выставляет onlinestore/asgi.py
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+
+database = {
+    'NAME': os.getenv('DB_NAME', 'onlinestore_db'),
+    'USER': os.getenv('DB_USER', 'postgres'),
+    'PASSWORD': os.getenv('DB_PASSWORD', ''),
+    'HOST': os.getenv('DB_HOST', 'localhost'),
+    'PORT': os.getenv('DB_PORT', '5432'),
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {'connect_timeout': 5},
+}
+if DB_POOL_MAX_SIZE:
+    # Пул psycopg сам проверяет и переиспользует соединения; CONN_MAX_AGE с ним должен быть 0
+    database['CONN_MAX_AGE'] = 0
+    database['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': 10,
+    }
+elif ASGI:
+    database['CONN_MAX_AGE'] = 0
+else:
+    database['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+DATABASES['default'].update(database)
+for alias in DATABASE_REPLICAS:
+    # У реплики свой хост, остальное — как у primary
+    DATABASES[alias].update({**database, 'HOST': DATABASES[alias]['HOST']})
+
+
+# За обратным прокси (nginx) с TLS
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+STATIC_ROOT = os.getenv('DJANGO_STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+LOGGING['root']['level'] = os.getenv('DJANGO_LOG_LEVEL', 'INFO')
@@ -0,0 +1,11 @@
+"""
+Настройки для тестов: python manage.py test --settings=onlinestore.settings_test.
+
+Добавляют алиас replica1 — зеркало default, как реплики из DB_REPLICA_HOSTS.
+Каталог с него читают только тесты роутера (override_settings(DATABASE_REPLICAS=...)),
+остальные тесты работают с default.
+"""
+from .settings import *  # noqa: F401,F403
+
+
+DATABASES.setdefault('replica1', {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}})
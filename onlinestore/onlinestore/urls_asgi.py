@@ -0,0 +1,16 @@
+"""
+URLconf для ASGI (ROOT_URLCONF при DJANGO_ASGI=1): карточка товара и корзина —
+async-представления. Под WSGI они платили бы async_to_sync и переходом в поток
+за каждый ORM-вызов, поэтому там остаются представления DRF из onlinestore.urls.
+Имена маршрутов те же, так что бюджеты запросов и метрики общие.
+"""
+from django.urls import path
+
+from api.views import AsyncCartAPI, AsyncProductDetailAPI
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/products/<int:pk>/', AsyncProductDetailAPI.as_view(), name='api_product_detail'),
+    path('api/cart/', AsyncCartAPI.as_view(), name='api_cart_list'),
+] + wsgi_urlpatterns
@@ -1,8 +1,15 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
 from django.contrib.admin.widgets import AdminFileWidget
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 from django.utils.html import format_html
-from .models import Category, Product, Order, Size, ProductSize
+from .models import Category, Product, Order, Size, ProductSize, Notification, Task, TelegramUser
+from .search import search_products
 
 
 class AdminImageWidget(AdminFileWidget):
@@ -25,12 +32,47 @@ class ProductSizeInline(admin.TabularInline):
     autocomplete_fields = ['size']  # Добавляем поиск по размерам
 
 
+class StockFilter(admin.SimpleListFilter):
+    """Фильтр по суммарному остатку (аннотация total_stock из ProductAdmin)"""
+    title = 'Наличие'
+    parameter_name = 'stock'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('in', 'В наличии'),
+            ('low', 'Мало'),
+            ('out', 'Нет в наличии'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'in':
+            return queryset.filter(total_stock__gt=10)
+        if self.value() == 'low':
+            return queryset.filter(total_stock__gt=0, total_stock__lte=10)
+        if self.value() == 'out':
+            return queryset.filter(total_stock=0)
+        return queryset
+
+
+class SearchRankChangeList(ChangeList):
+    """
+    При поиске без выбранной сортировки по колонке — порядок из
+    get_search_results (по релевантности), а не ordering модели.
+    """
+
+    def get_ordering(self, request, queryset):
+        if self.query and not self.params.get(ORDER_VAR):
+            return self._get_deterministic_ordering(list(queryset.query.order_by))
+        return super().get_ordering(request, queryset)
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('display_thumbnail', 'name', 'price', 'category', 'gender', 'stock_status')
     list_display_links = ('display_thumbnail', 'name')
-    list_filter = ('category', 'gender', 'available')
-    search_fields = ('name', 'description')
+    list_filter = ('category', 'gender', 'available', StockFilter)
+    list_select_related = ('category',)
+    search_fields = ('name',)
     list_editable = ('price',)
     inlines = [ProductSizeInline]
     readonly_fields = ('display_image_preview',)
@@ -46,11 +88,27 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        # Остаток по всем размерам считается в том же запросе, что и список товаров
+        return super().get_queryset(request).annotate(
+            total_stock=Coalesce(Sum('product_sizes__quantity'), 0)
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо icontains по name/description — полнотекстовый поиск по GIN-индексу;
+        # порядок по релевантности сохраняет SearchRankChangeList
+        if not search_term:
+            return queryset, False
+        return search_products(search_term, queryset), False
+
+    def get_changelist(self, request, **kwargs):
+        return SearchRankChangeList
+
     def display_thumbnail(self, obj):
         if obj.image:
             return format_html(
                 '<img src="{}" width="50" height="50" style="object-fit: cover; border-radius: 3px;"/>',
-                obj.image.url
+                obj.image_url('thumb', 'webp')
             )
         return "🖼️"
 
@@ -60,14 +118,14 @@ class ProductAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 400px; border-radius: 5px; border: 1px solid #eee;"/>',
-                obj.image.url
+                obj.image_url('large')
             )
         return "Изображение не загружено"
 
     display_image_preview.short_description = 'Превью'
 
     def stock_status(self, obj):
-        total = sum(ps.quantity for ps in obj.product_sizes.all())
+        total = obj.total_stock
         if total > 10:
             return format_html('<span style="color: green;">✓ В наличии ({})</span>', total)
         elif total > 0:
@@ -75,6 +133,7 @@ class ProductAdmin(admin.ModelAdmin):
         return format_html('<span style="color: red;">Нет в наличии</span>')
 
     stock_status.short_description = 'Наличие'
+    stock_status.admin_order_field = 'total_stock'
 
     def formfield_for_dbfield(self, db_field, request, **kwargs):
         if db_field.name == 'image':
@@ -113,15 +172,75 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: без фильтров берёт оценку числа строк из
+    статистики PostgreSQL (pg_class.reltuples) вместо полного COUNT(*).
+    """
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.estimate_threshold:
+                return int(row[0])
+        return super().count
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'created_at', 'status', 'display_total')
+    list_display = ('id', 'user', 'created_at', 'status', 'display_total')
     list_filter = ('status', 'created_at')
+    list_select_related = ('user',)
     date_hierarchy = 'created_at'
-    search_fields = ('id', 'customer_info')
+    # Сам поиск — в get_search_results; поля нужны, чтобы админка показала строку поиска
+    search_fields = ('id', 'user__username', 'user__telegram_user__telegram_id')
+    search_help_text = 'Номер заказа, username или Telegram ID покупателя'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по search_fields сравнивал бы UPPER(поле::text) — мимо индексов.
+        # Здесь — точные сравнения по PK, unique username и unique telegram_id
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdecimal() and int(search_term) < 2 ** 63:
+            number = int(search_term)
+            # Покупатель находится отдельным запросом: с подзапросом внутри OR
+            # PostgreSQL читал бы заказы целиком, а так — BitmapOr двух индексов
+            user_id = TelegramUser.objects.filter(telegram_id=number).values_list('user_id', flat=True).first()
+            condition = Q(id=number)
+            if user_id is not None:
+                condition |= Q(user_id=user_id)
+            return queryset.filter(condition), False
+        return queryset.filter(user__username=search_term), False
 
     def display_total(self, obj):
-        # Предполагаем, что у Order есть связь с OrderItem через related_name='items'
-        total = sum(item.price * item.quantity for item in obj.items.all())
-        return f"{total} ₽"
+        return f"{obj.total} ₽"
     display_total.short_description = 'Сумма заказа'
+    display_total.admin_order_field = 'total'
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'chat_id', 'order', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('chat_id', 'order__id')
+    readonly_fields = ('attempts', 'last_error', 'sent_at')
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'next_attempt_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('=id', 'idempotency_key')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'finished_at')
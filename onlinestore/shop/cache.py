@@ -0,0 +1,138 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from onlinestore.db_router import use_primary
+
+from .models import Category, Size
+
+
+CATALOG_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 15)
+
+
+def _generation_key(scope):
+    return f'catalog:gen:{scope}'
+
+
+def generation(scope):
+    """
+    Текущее поколение области каталога ('all' или 'category:<id>').
+
+    Поколение входит в ключи страниц, поэтому сброс области — это один incr,
+    а старые страницы просто перестают читаться и вытесняются по таймауту.
+    """
+    return cache.get_or_set(_generation_key(scope), time.time_ns, timeout=None)
+
+
+def bump(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_generation_key(scope))
+        except ValueError:
+            cache.set(_generation_key(scope), time.time_ns(), timeout=None)
+
+
+def category_scope(category_id):
+    return f'category:{category_id}' if category_id else 'all'
+
+
+def list_key(category_id, gender, size=None, price=None):
+    scope = category_scope(category_id)
+    key = f'catalog:list:{scope}:{generation(scope)}:{gender or "all"}'
+    if size or price:
+        # Размер и цена фильтруют по остаткам и ценам всего каталога
+        key += f':{generation("all")}:{size or "all"}:{price or "all"}'
+    return key
+
+
+def product_key(product_id):
+    return f'catalog:product:{product_id}'
+
+
+def invalidate_product(product_id, *category_ids):
+    """Сбрасывает карточку товара и списки всех затронутых категорий"""
+    cache.delete(product_key(product_id))
+    bump('all', *(category_scope(category_id) for category_id in category_ids if category_id))
+
+
+# (поколение, список категорий) — копия дерева категорий в памяти процесса
+_local_categories = (None, [])
+
+
+def get_categories():
+    """
+    Категории для меню и фильтров каталога.
+
+    Список живёт в памяти процесса и в общем кэше под ключом с поколением
+    'categories': пока поколение не сменилось, БД не запрашивается.
+    """
+    global _local_categories
+    version = generation('categories')
+    local_version, categories = _local_categories
+    if local_version == version:
+        return categories
+
+    key = f'catalog:categories:{version}'
+    categories = cache.get(key)
+    if categories is None:
+        with use_primary():
+            categories = list(Category.objects.all())
+        cache.set(key, categories, CATALOG_TIMEOUT)
+    _local_categories = (version, categories)
+    return categories
+
+
+def get_category_by_slug(slug):
+    return next((category for category in get_categories() if category.slug == slug), None)
+
+
+SIZES_KEY = 'catalog:sizes'
+
+
+def get_sizes():
+    """Справочник размеров для фильтров каталога; сбрасывается сигналами Size"""
+    sizes = cache.get(SIZES_KEY)
+    if sizes is None:
+        with use_primary():
+            sizes = list(Size.objects.all())
+        cache.set(SIZES_KEY, sizes, CATALOG_TIMEOUT)
+    return sizes
+
+
+def favorites_key(user_id):
+    return f'favorites:{user_id}'
+
+
+class CachedPaginator(Paginator):
+    """
+    Пагинатор, который хранит число товаров и содержимое страниц в кэше.
+
+    Промах кэша читается с primary: отставшая реплика не должна попасть в кэш.
+    """
+
+    def __init__(self, object_list, per_page, cache_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+
+    @cached_property
+    def count(self):
+        key = f'{self.cache_key}:count'
+        count = cache.get(key)
+        if count is None:
+            with use_primary():
+                count = Paginator.count.func(self)
+            cache.set(key, count, CATALOG_TIMEOUT)
+        return count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        key = f'{self.cache_key}:page:{number}'
+        object_list = cache.get(key)
+        if object_list is None:
+            with use_primary():
+                object_list = list(super().page(number).object_list)
+            cache.set(key, object_list, CATALOG_TIMEOUT)
+        return self._get_page(object_list, number, self)
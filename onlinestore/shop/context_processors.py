@@ -1,7 +1,7 @@
-from .models import Category, Product
+from .cache import get_categories
 
 
 def categories(request):
     return {
-        'categories': Category.objects.all()
+        'categories': get_categories()
     }
@@ -0,0 +1,154 @@
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from django.db.models.functions import Cast
+
+from onlinestore.db_router import use_primary
+
+from .cache import CATALOG_TIMEOUT, generation, get_categories, get_category_by_slug, get_sizes
+from .models import Product
+
+
+# (код, подпись, от, до) — диапазоны цен для фильтра, «до» не включается
+PRICE_BANDS = (
+    ('0-2000', 'до 2 000 ₽', None, 2000),
+    ('2000-5000', '2 000 – 5 000 ₽', 2000, 5000),
+    ('5000-10000', '5 000 – 10 000 ₽', 5000, 10000),
+    ('10000-', 'от 10 000 ₽', 10000, None),
+)
+
+FACETS = ('category', 'gender', 'size', 'price')
+
+
+def price_band_q(code):
+    for band_code, _, low, high in PRICE_BANDS:
+        if band_code == code:
+            q = Q()
+            if low is not None:
+                q &= Q(price__gte=low)
+            if high is not None:
+                q &= Q(price__lt=high)
+            return q
+    return None
+
+
+def get_filters(params, category_slug=None, gender=None):
+    """
+    Разбирает параметры фильтра каталога.
+
+    Категория и пол могут прийти из URL (имеют приоритет) или из GET.
+    Некорректные значения отбрасываются. Возвращает {фасет: значение}.
+    """
+    filters = {}
+
+    category = get_category_by_slug(category_slug or params.get('category') or '')
+    if category:
+        filters['category'] = category.id
+
+    gender = gender or params.get('gender')
+    if gender in dict(Product.GENDER_CHOICES):
+        filters['gender'] = gender
+
+    size = params.get('size')
+    if size and size.isdigit() and int(size) in {s.id for s in get_sizes()}:
+        filters['size'] = int(size)
+
+    price = params.get('price')
+    if price_band_q(price) is not None:
+        filters['price'] = price
+
+    return filters
+
+
+def apply_filters(queryset, filters, exclude=None):
+    for facet, value in filters.items():
+        if facet == exclude:
+            continue
+        if facet == 'category':
+            queryset = queryset.filter(category_id=value)
+        elif facet == 'gender':
+            queryset = queryset.filter(gender=value)
+        elif facet == 'size':
+            # unique_together(product, size) — JOIN не размножает строки
+            queryset = queryset.filter(product_sizes__size_id=value, product_sizes__quantity__gt=0)
+        elif facet == 'price':
+            queryset = queryset.filter(price_band_q(value))
+    return queryset
+
+
+def _price_band_case():
+    whens = [When(price_band_q(code), then=Value(code)) for code, *_ in PRICE_BANDS]
+    return Case(*whens, output_field=CharField())
+
+
+def _facet_query(queryset, facet, value_expression, filters):
+    """Группировка по значению фасета с учётом всех фильтров, кроме своего"""
+    return (
+        apply_filters(queryset, filters, exclude=facet)
+        .order_by()
+        .annotate(facet=Value(facet, output_field=CharField()), value=value_expression)
+        .values('facet', 'value')
+        .annotate(count=Count('id', distinct=True))
+        .values_list('facet', 'value', 'count')
+    )
+
+
+def count_facets(queryset, filters):
+    """
+    Счётчики всех фасетов одним запросом (UNION ALL четырёх GROUP BY).
+
+    Счётчик каждого фасета считается с остальными выбранными фильтрами, но без
+    своего — так видно, сколько товаров даст переключение на другое значение.
+    """
+    queries = [
+        _facet_query(queryset, 'category', Cast('category_id', CharField()), filters),
+        _facet_query(queryset, 'gender', F('gender'), filters),
+        _facet_query(
+            queryset.filter(product_sizes__quantity__gt=0), 'size',
+            Cast('product_sizes__size_id', CharField()), filters
+        ),
+        _facet_query(queryset, 'price', _price_band_case(), filters),
+    ]
+    counts = {facet: {} for facet in FACETS}
+    for facet, value, count in queries[0].union(*queries[1:], all=True):
+        counts[facet][value] = count
+    return counts
+
+
+def get_facets(filters):
+    """
+    Фасеты каталога с подписями, счётчиками и отметкой выбранного значения.
+
+    Результат кэшируется до любого изменения товаров или остатков (поколение 'all').
+    """
+    key = 'catalog:facets:{}:{}'.format(
+        generation('all'), ':'.join(f'{facet}={filters[facet]}' for facet in sorted(filters))
+    )
+    counts = cache.get(key)
+    if counts is None:
+        with use_primary():
+            counts = count_facets(Product.objects.filter(available=True), filters)
+        cache.set(key, counts, CATALOG_TIMEOUT)
+
+    options = {
+        'category': [(str(c.id), c.slug, c.name) for c in get_categories()],
+        'gender': [(code, code, label) for code, label in Product.GENDER_CHOICES],
+        'size': [(str(s.id), str(s.id), s.name) for s in get_sizes()],
+        'price': [(code, code, label) for code, label, *_ in PRICE_BANDS],
+    }
+    titles = {'category': 'Категория', 'gender': 'Пол', 'size': 'Размер', 'price': 'Цена'}
+    return [
+        {
+            'name': facet,
+            'title': titles[facet],
+            'options': [
+                {
+                    'value': param,
+                    'label': label,
+                    'count': counts[facet].get(key, 0),
+                    'selected': str(filters.get(facet)) == key,
+                }
+                for key, param, label in options[facet]
+            ],
+        }
+        for facet in FACETS
+    ]
@@ -0,0 +1,108 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .cache import invalidate_product
+from .models import Product
+from .queue import enqueue
+
+
+logger = logging.getLogger(__name__)
+
+# Имя варианта -> максимальные ширина и высота (пропорции сохраняются)
+VARIANTS = {
+    'thumb': (100, 100),   # админка, корзина, избранное
+    'card': (400, 400),    # карточка каталога
+    'large': (1200, 1200), # страница товара
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+def variant_name(product_id, image_name, variant, fmt):
+    """products/shoe.jpg -> products/variants/<id>/shoe_card.webp"""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return os.path.join(directory, 'variants', str(product_id), f'{stem}_{variant}.{extension}')
+
+
+def render_variant(image, size, fmt):
+    variant = image.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+    if fmt == 'jpeg' and variant.mode != 'RGB':
+        # В JPEG нет прозрачности: кладём изображение на белый фон
+        background = Image.new('RGB', variant.size, 'white')
+        variant = variant.convert('RGBA')
+        background.paste(variant, mask=variant.getchannel('A'))
+        variant = background
+    buffer = BytesIO()
+    variant.save(buffer, **FORMATS[fmt])
+    return buffer.getvalue()
+
+
+def build_variants(product_id, image_field):
+    """
+    Сохраняет все варианты рядом с оригиналом в том же хранилище.
+
+    Занятые имена хранилище не перезаписывает, а подбирает новые, поэтому
+    повторная генерация не трогает файлы, которые ещё отдаются. Возвращает
+    словарь для Product.image_variants: {'source': имя оригинала,
+    вариант: {формат: имя файла}}.
+    """
+    storage = image_field.storage
+    with storage.open(image_field.name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        variants = {'source': image_field.name}
+        for variant, size in VARIANTS.items():
+            variants[variant] = {}
+            for fmt in FORMATS:
+                name = variant_name(product_id, image_field.name, variant, fmt)
+                variants[variant][fmt] = storage.save(name, ContentFile(render_variant(image, size, fmt)))
+    return variants
+
+
+def variant_files(variants):
+    return [
+        name
+        for variant in VARIANTS
+        for name in (variants or {}).get(variant, {}).values()
+    ]
+
+
+def delete_variants(variants, storage, keep=()):
+    for name in variant_files(variants):
+        if name not in keep and storage.exists(name):
+            storage.delete(name)
+
+
+def generate_variants(product_id):
+    """Строит варианты и записывает их в товар без вызова save()"""
+    product = Product.objects.filter(pk=product_id).first()
+    if product is None or not product.image:
+        return
+    variants = build_variants(product.pk, product.image)
+    # Если пока мы работали, загрузили другое изображение — результат устарел
+    updated = Product.objects.filter(pk=product_id, image=product.image.name).update(image_variants=variants)
+    if not updated:
+        delete_variants(variants, product.image.storage)
+        return
+    delete_variants(product.image_variants, product.image.storage, keep=variant_files(variants))
+    invalidate_product(product.pk, product.category_id)
+
+
+def schedule_variants(product):
+    """Ставит генерацию в фоновую очередь, не задерживая запрос"""
+    enqueue(
+        'shop.generate_image_variants',
+        key=f'image-variants:{product.pk}:{product.image.name}',
+        product_id=product.pk,
+    )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from shop.images import generate_variants
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Строит WebP/JPEG-варианты изображений товаров (по умолчанию — только недостающие)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Перестроить варианты у всех товаров')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').only('id', 'image', 'image_variants')
+        ids = [product.pk for product in products if options['all'] or not product.has_image_variants]
+        failed = 0
+        for number, product_id in enumerate(ids, 1):
+            try:
+                generate_variants(product_id)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Товар {product_id}: {e}')
+            self.stdout.write(f'{number}/{len(ids)}', ending='\r')
+        self.stdout.write(self.style.SUCCESS(f'Обработано товаров: {len(ids) - failed}, с ошибкой: {failed}'))
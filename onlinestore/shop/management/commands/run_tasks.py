@@ -0,0 +1,40 @@
+import signal
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shop import tasks  # noqa: F401 — регистрирует задачи магазина
+from shop.queue import TaskWorker, purge_finished
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновых задач: выполняет задачи из таблицы Task в пуле потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.TASK_WORKERS, help='Размер пула потоков')
+        parser.add_argument('--batch-size', type=int, default=20, help='Сколько задач забирать за раз')
+        parser.add_argument('--poll-interval', type=float, default=2, help='Пауза при пустой очереди, секунды')
+        parser.add_argument('--once', action='store_true', help='Выполнить одну пачку и выйти')
+
+    def handle(self, *args, **options):
+        deleted = purge_finished(timedelta(days=settings.TASK_RETENTION_DAYS))
+        if deleted:
+            self.stdout.write(f'Удалено завершённых задач: {deleted}')
+
+        worker = TaskWorker(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+        )
+        if options['once']:
+            processed = worker.run_batch()
+            worker.executor.shutdown(wait=True)
+            self.stdout.write(f'Обработано задач: {processed}')
+            return
+
+        # Завершаемся после текущей пачки, не бросая задачи на середине
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        signal.signal(signal.SIGINT, lambda *_: worker.stop())
+        self.stdout.write(self.style.SUCCESS(f'Воркер запущен, потоков: {options["workers"]}'))
+        worker.run()
@@ -0,0 +1,165 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Схема моделей, которые менялись без миграций после 0003: размеры,
+    избранное, пользователи Telegram, пол товара и подписи полей.
+    """
+
+    # Под прежним именем миграция уже применена на развёрнутых базах
+    replaces = [('shop', '0004_size_alter_category_options_alter_order_options_and_more')]
+
+    dependencies = [
+        ('shop', '0003_order_orderitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Size',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='temp_size', max_length=20, verbose_name='Название размера')),
+                ('code', models.SlugField(default='temp_code', unique=True, verbose_name='Код размера')),
+            ],
+            options={
+                'verbose_name': 'Размер',
+                'verbose_name_plural': 'Размеры',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='category',
+            options={'verbose_name': 'Категория', 'verbose_name_plural': 'Категории'},
+        ),
+        migrations.AlterModelOptions(
+            name='order',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Заказ', 'verbose_name_plural': 'Заказы'},
+        ),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'ordering': ['-created'], 'verbose_name': 'Товар', 'verbose_name_plural': 'Товары'},
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='stock',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='gender',
+            field=models.CharField(choices=[('male', 'МУЖСКОЕ'), ('female', 'ЖЕНСКОЕ'), ('kid', 'ДЕТСКОЕ')], default='female', max_length=10, verbose_name='Пол'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(unique=True, verbose_name='URL'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='available',
+            field=models.BooleanField(default=True, verbose_name='Доступен'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='shop.category', verbose_name='Категория'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Создан'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='description',
+            field=models.TextField(verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(upload_to='products/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(unique=True, verbose_name='URL'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлен'),
+        ),
+        migrations.CreateModel(
+            name='Favorite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FavoriteItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('favorite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.favorite')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.product')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='size',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='shop.size', verbose_name='Размер'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='size',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='shop.size', verbose_name='Размер'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cartitem',
+            unique_together={('cart', 'product', 'size')},
+        ),
+        migrations.CreateModel(
+            name='TelegramUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('telegram_id', models.BigIntegerField(unique=True)),
+                ('username', models.CharField(blank=True, max_length=150, null=True)),
+                ('first_name', models.CharField(blank=True, max_length=150, null=True)),
+                ('last_name', models.CharField(blank=True, max_length=150, null=True)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='telegram_user', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductSize',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Колличество')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_sizes', to='shop.product', verbose_name='Товар')),
+                ('size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='size_products', to='shop.size', verbose_name='Размер')),
+            ],
+            options={
+                'verbose_name': 'Размер товара',
+                'verbose_name_plural': 'Размеры товаров',
+                'unique_together': {('product', 'size')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status', '-created_at'], name='order_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['available', 'category', 'gender', '-created'], name='product_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available', True)), fields=['-created'], name='product_available_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsize',
+            index=models.Index(condition=models.Q(('quantity__gt', 0)), fields=['product'], name='productsize_in_stock_idx'),
+        ),
+    ]
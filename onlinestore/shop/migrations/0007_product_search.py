@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:30
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+TRIGRAM_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']
+)
+
+
+def create_trigram_index(apps, schema_editor):
+    # Без pg_trgm на сервере нечёткий поиск просто выключен (shop.search.trigram_available)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.add_index(apps.get_model('shop', 'Product'), TRIGRAM_INDEX)
+
+
+def drop_trigram_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX.name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_catalog_order_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='russian', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='russian', weight='B'), django.contrib.postgres.search.SearchConfig('russian')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='product', index=TRIGRAM_INDEX)],
+            database_operations=[migrations.RunPython(create_trigram_index, drop_trigram_index)],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:55
+
+from django.db import migrations
+from django.db.models import Max, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Одно избранное на пользователя и один товар на избранное — иначе ограничения не создать"""
+    Favorite = apps.get_model('shop', 'Favorite')
+    FavoriteItem = apps.get_model('shop', 'FavoriteItem')
+
+    duplicated_users = (
+        Favorite.objects.values('user').annotate(keep=Min('id')).filter(keep__lt=Max('id'))
+    )
+    for row in duplicated_users:
+        extra = Favorite.objects.filter(user=row['user']).exclude(id=row['keep'])
+        FavoriteItem.objects.filter(favorite__in=extra).update(favorite=row['keep'])
+        extra.delete()
+
+    duplicated_items = (
+        FavoriteItem.objects.values('favorite', 'product').annotate(keep=Min('id')).filter(keep__lt=Max('id'))
+    )
+    for row in duplicated_items:
+        FavoriteItem.objects.filter(favorite=row['favorite'], product=row['product']).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
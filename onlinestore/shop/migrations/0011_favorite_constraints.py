@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_merge_duplicate_favorites'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user',), name='favorite_user_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='favoriteitem',
+            constraint=models.UniqueConstraint(fields=('favorite', 'product'), name='favorite_item_unique'),
+        ),
+    ]
@@ -1,10 +1,15 @@
-import os
+from decimal import Decimal
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from django.conf import settings
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -54,14 +59,46 @@ class Product(models.Model):
         upload_to='products/',
         verbose_name="Изображение"
     )
+    # Уменьшенные копии изображения, заполняет shop.images в фоне
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
     available = models.BooleanField(default=True, verbose_name='Доступен')
     created = models.DateTimeField(auto_now_add=True, verbose_name='Создан')
     updated = models.DateTimeField(auto_now=True, verbose_name='Обновлен')
+    # Поисковый вектор считает сама БД: название весомее описания
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config='russian')
+            + SearchVector('description', weight='B', config='russian')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
         ordering = ['-created']
+        indexes = [
+            # Каталог: фильтр по категории/полу, сортировка по новизне
+            models.Index(
+                fields=['available', 'category', 'gender', '-created'],
+                name='product_catalog_idx'
+            ),
+            # Главная и страницы пола без категории
+            models.Index(
+                fields=['-created'],
+                condition=Q(available=True),
+                name='product_available_created_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='product_search_idx'),
+            # Нечёткий поиск по названию при опечатках (pg_trgm)
+            GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.name
@@ -69,12 +106,32 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('product_detail', args=[self.id, self.slug])
 
+    def image_url(self, variant, fmt='jpeg'):
+        """URL варианта изображения; пока вариант не готов — URL оригинала"""
+        if not self.image:
+            return ''
+        variants = self.image_variants or {}
+        if variants.get('source') == self.image.name and fmt in variants.get(variant, {}):
+            return self.image.storage.url(variants[variant][fmt])
+        return self.image.url
+
+    @property
+    def has_image_variants(self):
+        return bool(self.image) and (self.image_variants or {}).get('source') == self.image.name
+
     def delete(self, *args, **kwargs):
-        # Удаляем файл изображения при удалении объекта
+        # Файлы изображения и его вариантов удалит фоновая задача после фиксации
+        names = []
         if self.image:
-            if os.path.isfile(self.image.path):
-                os.remove(self.image.path)
-        super().delete(*args, **kwargs)
+            from .images import variant_files
+
+            names = [self.image.name, *variant_files(self.image_variants)]
+        result = super().delete(*args, **kwargs)
+        if names:
+            from .queue import enqueue
+
+            enqueue('shop.delete_files', names=names)
+        return result
 
 
 
@@ -114,6 +171,13 @@ class ProductSize(models.Model):
         verbose_name = 'Размер товара'
         verbose_name_plural = 'Размеры товаров'
         unique_together = ('product', 'size')
+        indexes = [
+            models.Index(
+                fields=['product'],
+                condition=Q(quantity__gt=0),
+                name='productsize_in_stock_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.size.name}"
@@ -125,6 +189,11 @@ class Favorite(models.Model):
         on_delete=models.CASCADE, related_name='favorites',
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user'], name='favorite_user_unique'),
+        ]
+
     def __str__(self):
         return f"Избранное пользователя: {self.user.username}"
 
@@ -134,6 +203,12 @@ class FavoriteItem(models.Model):
     favorite = models.ForeignKey(Favorite, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            # Повторное добавление — INSERT ... ON CONFLICT DO NOTHING
+            models.UniqueConstraint(fields=['favorite', 'product'], name='favorite_item_unique'),
+        ]
+
     def __str__(self):
         return self.product.name
 
@@ -153,7 +228,24 @@ class Cart(models.Model):
 
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.items.summary()['total_price']
+
+
+class CartItemQuerySet(models.QuerySet):
+    """Позиции корзины с суммами, посчитанными на стороне БД"""
+    line_total = ExpressionWrapper(
+        F('quantity') * F('product__price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+    def with_line_totals(self):
+        return self.select_related('product', 'size').annotate(line_total=self.line_total)
+
+    def summary(self):
+        return self.aggregate(
+            total_price=Coalesce(Sum(self.line_total), Decimal('0'), output_field=DecimalField()),
+            total_quantity=Coalesce(Sum('quantity'), 0),
+        )
 
 
 class CartItem(models.Model):
@@ -179,6 +271,8 @@ class CartItem(models.Model):
 
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ('cart', 'product', 'size')
 
@@ -188,6 +282,8 @@ class CartItem(models.Model):
 
     @property
     def total_price(self):
+        if hasattr(self, 'line_total'):
+            return self.line_total
         return self.quantity * self.product.price
 
     def is_available(self):
@@ -204,6 +300,14 @@ class CartItem(models.Model):
         return True
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Позиции заказов с товарами и размерами — один запрос на всю выборку"""
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.select_related('product', 'size').order_by('id'))
+        )
+
+
 class Order(models.Model):
     """Модель заказов пользователей"""
     STATUS_CHOICES = [
@@ -227,10 +331,17 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     comment = models.TextField(blank=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status', '-created_at'], name='order_user_status_idx'),
+            # История заказов: keyset-пагинация по (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"Заказ #{self.id}"
@@ -262,6 +373,10 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+    @property
+    def total_price(self):
+        return self.quantity * self.price
+
 
 
 
@@ -280,3 +395,86 @@ class TelegramUser(models.Model):
 
     def __str__(self):
         return self.username or str(self.telegram_id)
+
+
+class Notification(models.Model):
+    """Исходящее сообщение бота в Telegram (очередь рассылки)"""
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+
+    chat_id = models.BigIntegerField(verbose_name='Чат')
+    text = models.TextField(verbose_name='Текст')
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        related_name='notifications',
+        null=True,
+        blank=True,
+        verbose_name='Заказ'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"Уведомление #{self.id} для {self.chat_id}"
+
+
+class Task(models.Model):
+    """Фоновая задача (очередь в БД, выполняет manage.py run_tasks)"""
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Аргументы')
+    # Повторная постановка с тем же ключом не создаёт вторую задачу
+    idempotency_key = models.CharField(
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Ключ идемпотентности'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='Максимум попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id}"
@@ -0,0 +1,83 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, is_first):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Keyset-пагинация: следующая страница — строки после последней строки
+    текущей по ключу сортировки (WHERE (created_at, id) < (...)), а не OFFSET,
+    поэтому сотая страница так же дешева, как первая.
+
+    Сортировка — по убыванию всех полей `fields`, последнее поле уникально.
+    Курсор — непрозрачная строка со значениями ключа последней строки;
+    испорченный курсор — ValueError.
+    """
+
+    def __init__(self, queryset, per_page, fields=('created_at', 'id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.fields = fields
+
+    def page(self, cursor=None):
+        rows = list(self.page_queryset(cursor)[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor, is_first=not cursor)
+
+    def page_queryset(self, cursor=None):
+        queryset = self.queryset.order_by(*(f'-{field}' for field in self.fields))
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor)))
+        return queryset
+
+    def after(self, values):
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            equal = {prev: values[prev] for prev in self.fields[:i]}
+            condition |= Q(**equal, **{f'{field}__lt': values[field]})
+        return condition
+
+    def encode_cursor(self, obj):
+        # str(), а не DjangoJSONEncoder: тот обрезает время до миллисекунд
+        values = [getattr(obj, field) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Некорректный курсор: {e}')
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise ValueError('Некорректный курсор')
+
+        model = self.queryset.model
+        try:
+            return {
+                field: model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            }
+        except (ValidationError, TypeError) as e:
+            raise ValueError(f'Некорректный курсор: {e}')
@@ -0,0 +1,199 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+# Имя задачи -> функция; заполняется декоратором @task в shop.tasks
+TASKS = {}
+
+
+def task(name):
+    """Регистрирует функцию как фоновую задачу; аргументы передаются именованными"""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, key=None, delay=0, max_attempts=5, **payload):
+    """
+    Ставит задачу в очередь в текущей транзакции.
+
+    Воркер увидит задачу только после фиксации, а при откате она исчезнет
+    вместе с остальными изменениями. Если задан `key` и задача с таким ключом
+    уже есть, возвращается она, а новая не создаётся; окончательно упавшая
+    задача при этом ставится в очередь заново с новыми аргументами.
+    """
+    defaults = {
+        'name': name,
+        'payload': payload,
+        'max_attempts': max_attempts,
+        'next_attempt_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if key is None:
+        return Task.objects.create(**defaults)
+    task_obj, created = Task.objects.get_or_create(idempotency_key=key, defaults=defaults)
+    if not created and task_obj.status == 'failed':
+        # Условный UPDATE: задачу, которую уже перезапустил другой вызов, не трогаем
+        reset = {**defaults, 'status': 'pending', 'attempts': 0, 'last_error': '', 'finished_at': None}
+        if Task.objects.filter(pk=task_obj.pk, status='failed').update(**reset):
+            for field, value in reset.items():
+                setattr(task_obj, field, value)
+        else:
+            task_obj.refresh_from_db()
+    return task_obj
+
+
+class LeasedQueue:
+    """
+    Очередь в таблице с полями status, attempts, next_attempt_at и last_error
+    (задачи Task, уведомления бота Notification).
+
+    Обработчики забирают пачки с арендой, результаты пачки записывают двумя
+    запросами, а неудачи откладывают с экспоненциальной задержкой.
+    `done_status` и `done_at` — статус и поле времени успешной обработки;
+    `failed_at` — поле, в которое пишется время окончательной ошибки.
+    """
+    retry_fields = ['status', 'attempts', 'next_attempt_at', 'last_error']
+
+    def __init__(self, model, done_status, done_at, base_delay, max_delay, failed_at=None):
+        self.model = model
+        self.done_status = done_status
+        self.done_at = done_at
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failed_at = failed_at
+
+    def claim(self, limit, lease):
+        """
+        Забирает пачку строк к обработке.
+
+        Строки блокируются с SKIP LOCKED и откладываются на `lease` секунд: если
+        обработчик упадёт посреди работы, пачку после этого заберёт другой.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                self.model.objects
+                .select_for_update(skip_locked=True)
+                .filter(status='pending', next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'id')
+                .values_list('id', flat=True)[:limit]
+            )
+            self.model.objects.filter(id__in=ids).update(next_attempt_at=now + timedelta(seconds=lease))
+        return list(self.model.objects.filter(id__in=ids).order_by('id'))
+
+    def save_results(self, done_ids, retried):
+        """Отмечает обработанные одним UPDATE, остальные — одним bulk_update"""
+        if done_ids:
+            self.model.objects.filter(id__in=done_ids).update(
+                status=self.done_status, **{self.done_at: timezone.now()}
+            )
+        if retried:
+            fields = self.retry_fields + ([self.failed_at] if self.failed_at else [])
+            self.model.objects.bulk_update(retried, fields)
+
+    def fail(self, obj, error):
+        obj.status = 'failed'
+        obj.last_error = error
+        if self.failed_at:
+            setattr(obj, self.failed_at, timezone.now())
+
+    def retry(self, obj, error, max_attempts, delay=None, count_attempt=True):
+        """
+        Откладывает строку после неудачи (сохраняется в save_results).
+
+        Без `delay` задержка растёт вдвое с каждой попыткой; после
+        `max_attempts` попыток строка помечается ошибочной.
+        """
+        if count_attempt:
+            obj.attempts += 1
+        if obj.attempts >= max_attempts:
+            self.fail(obj, error)
+            return
+        obj.last_error = error
+        if delay is None:
+            delay = min(self.base_delay * 2 ** obj.attempts, self.max_delay)
+        obj.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+
+
+task_queue = LeasedQueue(Task, 'done', 'finished_at', base_delay=10, max_delay=60 * 60, failed_at='finished_at')
+
+
+def purge_finished(older_than):
+    """Удаляет выполненные и упавшие задачи старше `older_than` (ключи идемпотентности освобождаются)"""
+    deleted, _ = Task.objects.filter(
+        status__in=['done', 'failed'], finished_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
+
+
+class TaskWorker:
+    """
+    Выполняет задачи из таблицы Task в пуле потоков.
+
+    Пачка забирается из БД, выполняется параллельно, результаты записываются
+    двумя запросами. Упавшая задача откладывается с экспоненциальной
+    задержкой, после `max_attempts` попыток помечается ошибочной.
+    """
+
+    def __init__(self, workers=4, batch_size=20, poll_interval=2, lease=300):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='task-worker')
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    processed = self.run_batch()
+                except Exception:
+                    logger.exception("Ошибка обработки очереди задач")
+                    close_old_connections()
+                    processed = 0
+                if not processed:
+                    self.stopped.wait(self.poll_interval)
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        self.stopped.set()
+
+    def run_batch(self):
+        batch = task_queue.claim(self.batch_size, self.lease)
+        if not batch:
+            return 0
+
+        results = list(self.executor.map(self.execute, batch))
+        done_ids = [t.id for t, ok in zip(batch, results) if ok]
+        retried = [t for t, ok in zip(batch, results) if not ok]
+        task_queue.save_results(done_ids, retried)
+        return len(batch)
+
+    def execute(self, task_obj):
+        # Задача может упасть, оставив соединение сломанным или в транзакции:
+        # перед следующей задачей этого потока Django заменит его новым
+        close_old_connections()
+        try:
+            func = TASKS.get(task_obj.name)
+            if func is None:
+                task_queue.fail(task_obj, 'Неизвестная задача')
+                return False
+            func(**task_obj.payload)
+        except Exception as e:
+            logger.exception(f"Задача {task_obj} завершилась ошибкой")
+            task_queue.retry(task_obj, repr(e), task_obj.max_attempts)
+            return False
+        finally:
+            close_old_connections()
+        return True
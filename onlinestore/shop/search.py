@@ -0,0 +1,49 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import F
+
+from .models import Product
+
+
+SEARCH_CONFIG = 'russian'
+
+# alias БД -> установлено ли pg_trgm (миграция 0007 ставит его, только если сервер позволяет)
+_trigram_available = {}
+
+
+def trigram_available(using='default'):
+    if using not in _trigram_available:
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[using] = cursor.fetchone() is not None
+    return _trigram_available[using]
+
+
+def search_products(query, queryset=None):
+    """
+    Полнотекстовый поиск по товарам с ранжированием.
+
+    Ищет по search_vector (GIN-индекс), результаты отсортированы по SearchRank.
+    Если по словам ничего не нашлось (например, опечатка), ищет по похожести
+    названия через триграммы: оператор % (порог pg_trgm.similarity_threshold)
+    тоже идёт по GIN-индексу. Без расширения pg_trgm запасного варианта нет.
+    """
+    if queryset is None:
+        queryset = Product.objects.filter(available=True).defer('search_vector')
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    results = (
+        queryset
+        .filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query))
+        .order_by('-rank', '-created')
+    )
+    if results.exists() or not trigram_available(results.db):
+        return results
+
+    return (
+        queryset
+        .filter(name__trigram_similar=query)
+        .annotate(rank=TrigramSimilarity('name', query))
+        .order_by('-rank', '-created')
+    )
@@ -0,0 +1,257 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, Q, Subquery, Value, When
+from django.utils import timezone
+
+from onlinestore.db_router import use_primary
+
+from .cache import favorites_key, invalidate_product
+from .models import Cart, CartItem, Favorite, FavoriteItem, Order, OrderItem, Product, ProductSize
+from .queue import enqueue
+
+
+class CheckoutError(Exception):
+    """Базовая ошибка оформления заказа"""
+
+
+class EmptyCartError(CheckoutError):
+    def __init__(self):
+        super().__init__('Корзина пуста')
+
+
+class OutOfStockError(CheckoutError):
+    def __init__(self, items):
+        self.items = items
+        names = ', '.join(str(item) for item in items)
+        super().__init__(f'Недостаточно товара: {names}')
+
+
+class InvalidCartOperation(Exception):
+    """Операция с корзиной ссылается на несуществующий товар или размер"""
+
+
+def _invalidate_catalog(products):
+    for product in products:
+        invalidate_product(product.pk, product.category_id)
+
+
+@transaction.atomic
+def place_order(user, comment=''):
+    """
+    Оформляет заказ из корзины пользователя за постоянное число запросов.
+
+    Корзина и строки ProductSize блокируются (select_for_update, по возрастанию id,
+    чтобы параллельные оформления не взаимоблокировались), остатки списываются
+    одним UPDATE через F(), позиции заказа пишутся одним bulk_create.
+    Уведомление покупателю ставится в фоновую очередь.
+    """
+    cart = Cart.objects.select_for_update().get(user=user)
+    items = list(cart.items.select_related('product', 'size').order_by('id'))
+    if not items:
+        raise EmptyCartError()
+
+    sized_items = [item for item in items if item.size_id]
+    stock = {}
+    if sized_items:
+        lookup = Q()
+        for item in sized_items:
+            lookup |= Q(product_id=item.product_id, size_id=item.size_id)
+        stock = {
+            (ps.product_id, ps.size_id): ps
+            for ps in ProductSize.objects.select_for_update().filter(lookup).order_by('id')
+        }
+
+    shortage = [
+        item for item in sized_items
+        if (item.product_id, item.size_id) not in stock
+        or stock[item.product_id, item.size_id].quantity < item.quantity
+    ]
+    if shortage:
+        raise OutOfStockError(shortage)
+
+    if sized_items:
+        decrements = [
+            When(pk=stock[item.product_id, item.size_id].pk, then=Value(item.quantity))
+            for item in sized_items
+        ]
+        ProductSize.objects.filter(
+            pk__in=[ps.pk for ps in stock.values()]
+        ).update(quantity=F('quantity') - Case(*decrements, output_field=IntegerField()))
+        # update() не шлёт сигналы, поэтому кэш каталога сбрасываем сами
+        products = [item.product for item in sized_items]
+        transaction.on_commit(lambda: _invalidate_catalog(products))
+
+    order = Order.objects.create(
+        user=user,
+        total=sum(item.product.price * item.quantity for item in items),
+        comment=comment,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=item.product,
+            size=item.size,
+            quantity=item.quantity,
+            price=item.product.price,
+        )
+        for item in items
+    ])
+    CartItem.objects.filter(pk__in=[item.pk for item in items]).delete()
+    # Подтверждение отправит воркер очереди; задача фиксируется вместе с заказом
+    enqueue('shop.notify_order_placed', key=f'order-placed:{order.id}', order_id=order.id)
+    return order
+
+
+@transaction.atomic
+def update_cart(user, operations):
+    """
+    Применяет к корзине пачку операций за постоянное число запросов.
+
+    Операция — словарь {'op': 'add' | 'update' | 'remove', 'product_id',
+    'size_id', 'quantity'}; 'update' с quantity=0 удаляет позицию. Операции
+    применяются по порядку к состоянию корзины в памяти, затем итог
+    проверяется по остаткам одним запросом и пишется bulk_create,
+    bulk_update и одним DELETE. Корзина блокируется на время изменения.
+    """
+    cart, _ = Cart.objects.select_for_update().get_or_create(user=user)
+    lines = {(item.product_id, item.size_id): item for item in cart.items.order_by('id')}
+    quantities = {key: item.quantity for key, item in lines.items()}
+    touched = {}  # ключи в порядке первого упоминания
+
+    for operation in operations:
+        key = (operation['product_id'], operation.get('size_id'))
+        if operation['op'] == 'add':
+            quantities[key] = quantities.get(key, 0) + operation.get('quantity', 1)
+        elif operation['op'] == 'update':
+            quantities[key] = operation['quantity']
+        else:
+            quantities[key] = 0
+        touched[key] = True
+
+    # Остатки проверяем только для позиций, которые стали больше нуля
+    wanted = {key: quantities[key] for key in touched if quantities[key] > 0}
+    products = {
+        product.pk: product
+        for product in Product.objects.filter(pk__in={key[0] for key in wanted}, available=True)
+    }
+    missing = [key for key in wanted if key[0] not in products]
+    if missing:
+        raise InvalidCartOperation(f'Товар недоступен: {missing[0][0]}')
+
+    sized = [key for key in wanted if key[1] is not None]
+    stock = {}
+    if sized:
+        lookup = Q()
+        for product_id, size_id in sized:
+            lookup |= Q(product_id=product_id, size_id=size_id)
+        stock = {
+            (ps.product_id, ps.size_id): ps
+            for ps in ProductSize.objects.filter(lookup).select_related('size')
+        }
+    missing = [key for key in sized if key not in stock]
+    if missing:
+        raise InvalidCartOperation(f'Размер недоступен: {missing[0][1]}')
+
+    shortage = [
+        CartItem(cart=cart, product=products[key[0]], size=stock[key].size, quantity=wanted[key])
+        for key in sized
+        if stock[key].quantity < wanted[key]
+    ]
+    if shortage:
+        raise OutOfStockError(shortage)
+
+    to_create, to_update, to_delete = [], [], []
+    for key in touched:
+        item = lines.get(key)
+        if item is None:
+            if quantities[key] > 0:
+                to_create.append(CartItem(cart=cart, product_id=key[0], size_id=key[1], quantity=quantities[key]))
+        elif quantities[key] == 0:
+            to_delete.append(item.pk)
+        elif item.quantity != quantities[key]:
+            item.quantity = quantities[key]
+            to_update.append(item)
+
+    if to_create:
+        CartItem.objects.bulk_create(to_create)
+    if to_update:
+        CartItem.objects.bulk_update(to_update, ['quantity'])
+    if to_delete:
+        CartItem.objects.filter(pk__in=to_delete).delete()
+    if to_create or to_update or to_delete:
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+    return cart
+
+
+FAVORITES_TIMEOUT = getattr(settings, 'FAVORITES_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def get_favorite_ids(user_id):
+    """
+    Множество id избранных товаров пользователя.
+
+    Хранится в кэше, поэтому списки и карточки товаров проверяют «в избранном
+    ли» без запросов; промах — один запрос. Сбрасывается в set_favorite().
+    """
+    key = favorites_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            FavoriteItem.objects.filter(favorite__user_id=user_id).values_list('product_id', flat=True)
+        )
+        cache.set(key, ids, FAVORITES_TIMEOUT)
+    return ids
+
+
+def set_favorite(user_id, product_id, is_favorite):
+    """
+    Добавляет товар в избранное или убирает из него; повторный вызов ничего не меняет.
+
+    Добавление — один INSERT ... SELECT ... ON CONFLICT DO NOTHING, удаление —
+    один DELETE. Если ничего не вставилось, вторым запросом выясняется почему:
+    товар уже в избранном, товара нет (Product.DoesNotExist) или у пользователя
+    ещё нет Favorite (тогда он создаётся и вставка повторяется).
+    """
+    if is_favorite:
+        if not _insert_favorite_item(user_id, product_id):
+            with use_primary():
+                found = list(
+                    Product.objects.filter(pk=product_id)
+                    .annotate(favorite_id=Subquery(Favorite.objects.filter(user_id=user_id).values('id')))
+                    .values_list('favorite_id', flat=True)
+                )
+            if not found:
+                raise Product.DoesNotExist(f'Товар {product_id} не найден')
+            if found[0] is None:
+                Favorite.objects.get_or_create(user_id=user_id)
+                _insert_favorite_item(user_id, product_id)
+    else:
+        FavoriteItem.objects.filter(favorite__user_id=user_id, product_id=product_id).delete()
+
+    # Сразу — чтобы этот же процесс не прочитал старый набор, после
+    # фиксации — чтобы набор, перечитанный до неё, не остался в кэше
+    cache.delete(favorites_key(user_id))
+    transaction.on_commit(lambda: cache.delete(favorites_key(user_id)))
+    return is_favorite
+
+
+def _insert_favorite_item(user_id, product_id):
+    """
+    Добавляет товар в избранное пользователя одним запросом, возвращает число
+    вставленных строк. Строка появляется, только если есть и Favorite
+    пользователя, и сам товар, поэтому внешний ключ не нарушается и при
+    отложенной проверке во внешней транзакции.
+    """
+    with connections[router.db_for_write(FavoriteItem)].cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {FavoriteItem._meta.db_table} (favorite_id, product_id)
+            SELECT favorite.id, product.id
+            FROM {Favorite._meta.db_table} favorite, {Product._meta.db_table} product
+            WHERE favorite.user_id = %s AND product.id = %s
+            ON CONFLICT (favorite_id, product_id) DO NOTHING
+            """,
+            [user_id, product_id],
+        )
+        return cursor.rowcount
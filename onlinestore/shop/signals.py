@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import SIZES_KEY, bump, category_scope, invalidate_product
+from .images import schedule_variants
+from .models import Category, Notification, Order, Product, ProductSize, Size, TelegramUser
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    # Товар мог переехать в другую категорию — её страницы тоже нужно сбросить
+    instance._old_category_id = None
+    if instance.pk:
+        instance._old_category_id = (
+            Product.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate_product(instance.pk, instance.category_id, getattr(instance, '_old_category_id', None))
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    # Варианты строятся для нового изображения; при прочих правках товара они уже актуальны
+    if raw or not instance.image or instance.has_image_variants:
+        return
+    schedule_variants(instance)
+
+
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+def invalidate_product_size_cache(sender, instance, **kwargs):
+    category_id = Product.objects.filter(pk=instance.product_id).values_list('category_id', flat=True).first()
+    invalidate_product(instance.product_id, category_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    bump('all', 'categories', category_scope(instance.pk))
+
+
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+def invalidate_size_cache(sender, instance, **kwargs):
+    cache.delete(SIZES_KEY)
+    bump('all')
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._old_status = None
+    if instance.pk:
+        instance._old_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def notify_order_status(sender, instance, created, **kwargs):
+    """Ставит в очередь бота сообщение о смене статуса заказа"""
+    if created or instance._old_status in (None, instance.status):
+        return
+
+    chat_id = TelegramUser.objects.filter(user_id=instance.user_id).values_list('telegram_id', flat=True).first()
+    if chat_id is None:
+        return
+
+    Notification.objects.create(
+        chat_id=chat_id,
+        order=instance,
+        text=f"🛍 Заказ #{instance.id}\n📦 Статус: {instance.get_status_display()}",
+    )
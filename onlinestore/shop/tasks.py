@@ -0,0 +1,36 @@
+"""Фоновые задачи магазина; выполняются командой manage.py run_tasks"""
+from django.core.files.storage import default_storage
+
+from .images import generate_variants
+from .models import Notification, Order
+from .queue import task
+
+
+@task('shop.generate_image_variants')
+def generate_image_variants(product_id):
+    generate_variants(product_id)
+
+
+@task('shop.delete_files')
+def delete_files(names):
+    for name in names:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+
+
+@task('shop.notify_order_placed')
+def notify_order_placed(order_id):
+    """Подтверждение заказа в Telegram (через очередь рассылки бота)"""
+    order = (
+        Order.objects
+        .select_related('user__telegram_user')
+        .filter(pk=order_id, user__telegram_user__isnull=False)
+        .first()
+    )
+    if order is None:
+        return
+    Notification.objects.create(
+        chat_id=order.user.telegram_user.telegram_id,
+        order=order,
+        text=f"✅ Заказ #{order.id} оформлен\n💰 Сумма: {order.total} ₽\n📦 Статус: {order.get_status_display()}",
+    )
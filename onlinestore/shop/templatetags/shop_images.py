@@ -0,0 +1,20 @@
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_picture(product, variant, css_class='', loading='lazy'):
+    """<picture> с WebP и JPEG-вариантом товара; без вариантов — оригинал"""
+    if not product.image:
+        return ''
+    if not product.has_image_variants:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}">',
+            product.image.url, product.name, css_class, loading
+        )
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp"><img src="{}" alt="{}" class="{}" loading="{}"></picture>',
+        product.image_url(variant, 'webp'), product.image_url(variant, 'jpeg'), product.name, css_class, loading
+    )
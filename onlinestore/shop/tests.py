@@ -1,3 +1,562 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from contextlib import ExitStack
+from datetime import timedelta
+from io import BytesIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from onlinestore.db_router import PIN_COOKIE, PrimaryReplicaRouter, ReplicaPinningMiddleware, use_primary
+from onlinestore.metrics import QueryBudgetMixin
+
+from .facets import apply_filters, count_facets
+from .images import generate_variants
+from .models import Cart, Category, FavoriteItem, Product, Size, ProductSize, Order, OrderItem, Task, TelegramUser
+from .pagination import KeysetPaginator
+from .queue import TASKS, TaskWorker, enqueue, purge_finished, task
+from .search import search_products, trigram_available
+from .services import get_favorite_ids, set_favorite
+from .tasks import delete_files
+from .views import ProductListView
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Планы запросов проверяются на PostgreSQL')
+class QueryPlanTests(TestCase):
+    """Ключевые запросы каталога и заказов должны идти по своим индексам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Обувь', slug='shoes')
+        cls.user = User.objects.create_user('buyer')
+        size = Size.objects.create(name='M', code='m')
+        for i in range(20):
+            product = Product.objects.create(
+                category=cls.category, name=f'Товар {i}', slug=f'product-{i}',
+                description='', price=100, image='products/1.jpg',
+                gender='male' if i % 2 else 'female',
+            )
+            ProductSize.objects.create(product=product, size=size, quantity=i % 3)
+            Order.objects.create(user=cls.user, total=100)
+        cls.product = product
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            # На маленькой таблице seq scan всегда дешевле — проверяем, что индекс вообще применим
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def catalog_queryset(self, **kwargs):
+        view = ProductListView()
+        view.setup(RequestFactory().get('/'), **kwargs)
+        return view.get_queryset()
+
+    def test_catalog_by_category_and_gender(self):
+        queryset = self.catalog_queryset(category_slug='shoes', gender='male')
+        self.assertUsesIndex(queryset, 'product_catalog_idx')
+
+    def test_catalog_main_page(self):
+        self.assertUsesIndex(self.catalog_queryset()[:10], 'product_available_created_idx')
+
+    def test_sizes_in_stock(self):
+        queryset = ProductSize.objects.filter(product=self.product, quantity__gt=0)
+        self.assertUsesIndex(queryset, 'productsize_in_stock_idx')
+
+    def test_order_history_page(self):
+        paginator = KeysetPaginator(Order.objects.filter(user=self.user), 10)
+        cursor = paginator.page().next_cursor
+        self.assertUsesIndex(paginator.page_queryset(cursor)[:11], 'order_user_created_id_idx')
+
+    def test_orders_by_status(self):
+        queryset = Order.objects.filter(user=self.user, status='new').order_by('-created_at')
+        self.assertUsesIndex(queryset, 'order_user_status_idx')
+
+    def test_admin_order_search(self):
+        TelegramUser.objects.create(user=self.user, telegram_id=279058397)
+        order_admin = admin.site._registry[Order]
+        request = RequestFactory().get('/admin/shop/order/')
+
+        def search(term):
+            queryset, _ = order_admin.get_search_results(request, Order.objects.all(), term)
+            return queryset
+
+        order = Order.objects.first()
+        self.assertEqual(list(search(str(order.id))), [order])
+        self.assertEqual(search('279058397').count(), 20)
+        self.assertEqual(search('buyer').count(), 20)
+        self.assertFalse(search('нет такого').exists())
+
+        self.assertUsesIndex(search(str(order.id)), 'shop_order_pkey')
+        self.assertUsesIndex(search('279058397'), 'order_user_created_id_idx')
+        self.assertUsesIndex(search('buyer'), 'Index Scan using auth_user_username')
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        shoes = Category.objects.create(name='Обувь', slug='shoes')
+        jackets = Category.objects.create(name='Куртки', slug='jackets')
+        cls.small, cls.large = Size.objects.create(name='S', code='s'), Size.objects.create(name='L', code='l')
+        for i, (category, gender, price) in enumerate([
+            (shoes, 'male', 1500), (shoes, 'female', 3000), (shoes, 'male', 12000), (jackets, 'male', 4000),
+        ]):
+            product = Product.objects.create(
+                category=category, name=f'Товар {i}', slug=f'product-{i}',
+                description='', price=price, image='products/1.jpg', gender=gender,
+            )
+            ProductSize.objects.create(product=product, size=cls.small, quantity=1)
+            ProductSize.objects.create(product=product, size=cls.large, quantity=i % 2)
+        cls.shoes, cls.jackets = shoes, jackets
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_in_one_query(self):
+        filters = {'gender': 'male', 'size': self.large.id}
+        with self.assertNumQueries(1):
+            counts = count_facets(Product.objects.filter(available=True), filters)
+
+        # Свой фильтр фасета не учитывается, чужие — учитываются
+        self.assertEqual(counts['gender'], {'male': 1, 'female': 1})
+        self.assertEqual(counts['size'], {str(self.small.id): 3, str(self.large.id): 1})
+        self.assertEqual(counts['category'], {str(self.jackets.id): 1})
+        self.assertEqual(counts['price'], {'2000-5000': 1})
+
+    def test_apply_filters(self):
+        filters = {'category': self.shoes.id, 'price': '0-2000', 'size': self.small.id}
+        queryset = apply_filters(Product.objects.all(), filters)
+        self.assertEqual(list(queryset.values_list('slug', flat=True)), ['product-0'])
+
+    def test_catalog_page(self):
+        response = self.client.get('/shoes/', {'price': '2000-5000'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.slug for p in response.context['products']], ['product-1'])
+        price = next(facet for facet in response.context['facets'] if facet['name'] == 'price')
+        self.assertEqual(
+            {option['value']: option['count'] for option in price['options']},
+            {'0-2000': 1, '2000-5000': 1, '5000-10000': 0, '10000-': 1},
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Поиск работает на PostgreSQL')
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+
+        def create(name, description, slug, **kwargs):
+            return Product.objects.create(
+                category=category, name=name, slug=slug, description=description,
+                price=100, image='products/1.jpg', **kwargs
+            )
+
+        cls.sneakers = create('Кроссовки беговые', 'Лёгкие', 'sneakers')
+        cls.shirt = create('Футболка', 'Хорошо смотрится с кроссовками', 'shirt')
+        cls.jacket = create('Куртка', 'Тёплая', 'jacket')
+        cls.brand = create('Adidas Superstar', 'Классика', 'superstar')
+        cls.old_sneakers = create('Кроссовки старые', '', 'old-sneakers', available=False)
+
+    def test_full_text_ranking(self):
+        # Морфология: «кроссовки» находит и «кроссовками» в описании,
+        # но совпадение в названии (вес A) выше совпадения в описании (вес B)
+        results = list(search_products('кроссовки'))
+        self.assertEqual(results, [self.sneakers, self.shirt])
+        self.assertGreater(results[0].rank, results[1].rank)
+        self.assertEqual(list(search_products('-футболка кроссовки')), [self.sneakers])
+
+    def test_admin_search_ranked(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        response = self.client.get('/admin/shop/product/', {'q': 'кроссовки'})
+        # Админка показывает и снятые с продажи; без сортировки по релевантности
+        # первыми шли бы более новые товары
+        results = list(response.context['cl'].result_list)
+        self.assertEqual(results[-1], self.shirt)
+        self.assertCountEqual(results[:2], [self.sneakers, self.old_sneakers])
+
+        response = self.client.get('/admin/shop/product/', {'q': 'кроссовки', 'o': '2'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_trigram_fallback(self):
+        if not trigram_available():
+            self.skipTest('На сервере нет расширения pg_trgm')
+
+        # По словам опечатка ничего не находит — ищется похожее название
+        self.assertEqual(list(search_products('adidsa superstar')), [self.brand])
+        self.assertFalse(search_products('zzzz').exists())
+
+    def test_without_trigram(self):
+        if trigram_available():
+            self.skipTest('pg_trgm установлено')
+
+        # Миграция пропустила расширение и индекс — поиск остаётся только полнотекстовым
+        self.assertFalse(search_products('adidsa superstar').exists())
+        self.assertEqual(list(search_products('adidas superstar')), [self.brand])
+
+
+class ProductDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        cls.product = Product.objects.create(
+            category=category, name='Товар', slug='product', description='', price=100, image='products/1.jpg',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_wrong_slug(self):
+        url = f'/product/{self.product.id}/wrong-slug/'
+        # И на холодном кэше, и после того как товар в него попал
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(self.product.get_absolute_url()).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+        buffer = BytesIO()
+        Image.new('RGBA', (1600, 800), (255, 0, 0, 128)).save(buffer, 'PNG')
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        self.product = Product.objects.create(
+            category=category, name='Товар', slug='product', description='', price=100,
+            image=SimpleUploadedFile('shoe.png', buffer.getvalue()),
+        )
+
+    def test_variants_generated_and_deleted(self):
+        self.assertFalse(self.product.has_image_variants)
+        self.assertEqual(self.product.image_url('card', 'webp'), self.product.image.url)
+
+        generate_variants(self.product.pk)
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.has_image_variants)
+        storage = self.product.image.storage
+        card = self.product.image_variants['card']
+        with storage.open(card['webp']) as webp, storage.open(card['jpeg']) as jpeg:
+            self.assertEqual(Image.open(webp).format, 'WEBP')
+            self.assertEqual(Image.open(jpeg).size, (400, 200))
+        self.assertEqual(self.product.image_url('card', 'webp'), storage.url(card['webp']))
+
+        self.product.delete()
+        self.assertTrue(storage.exists(card['webp']))
+        delete_files(**Task.objects.get(name='shop.delete_files').payload)
+        self.assertFalse(storage.exists(card['webp']))
+        self.assertFalse(storage.exists(card['jpeg']))
+
+
+class TaskQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.calls = []
+
+        @task('test.ok')
+        def ok(value):
+            self.calls.append(value)
+
+        @task('test.broken')
+        def broken():
+            raise RuntimeError('boom')
+
+        self.addCleanup(TASKS.pop, 'test.ok')
+        self.addCleanup(TASKS.pop, 'test.broken')
+
+    def test_idempotency_key(self):
+        first = enqueue('test.ok', key='once', value=1)
+        second = enqueue('test.ok', key='once', value=2)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_reenqueue_after_failure(self):
+        failed = enqueue('test.broken', key='once', max_attempts=1)
+        worker = TaskWorker(workers=1)
+        self.addCleanup(worker.executor.shutdown)
+        with self.assertLogs('shop.queue', 'ERROR'):
+            worker.run_batch()
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, 'failed')
+
+        # Ключ не заблокирован навсегда: задача перезапускается с новыми аргументами
+        task_obj = enqueue('test.ok', key='once', value=1)
+        self.assertEqual(task_obj.pk, failed.pk)
+        self.assertEqual(worker.run_batch(), 1)
+        self.assertEqual(self.calls, [1])
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.attempts, task_obj.last_error), ('done', 0, ''))
+
+    def test_purge_finished(self):
+        old = timezone.now() - timedelta(days=8)
+        for status in ('pending', 'done', 'failed'):
+            Task.objects.create(name='test.ok', idempotency_key=status, status=status, finished_at=old)
+        Task.objects.create(name='test.ok', idempotency_key='recent', status='failed', finished_at=timezone.now())
+
+        self.assertEqual(purge_finished(timedelta(days=7)), 2)
+        self.assertCountEqual(Task.objects.values_list('idempotency_key', flat=True), ['pending', 'recent'])
+
+    def test_worker_runs_and_retries(self):
+        done = enqueue('test.ok', value=1)
+        failed = enqueue('test.broken')
+        worker = TaskWorker(workers=2)
+        self.addCleanup(worker.executor.shutdown)
+
+        with self.assertLogs('shop.queue', 'ERROR'):
+            self.assertEqual(worker.run_batch(), 2)
+        self.assertEqual(self.calls, [1])
+        done.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual(done.status, 'done')
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertIn('boom', failed.last_error)
+        # Повтор отложен — следующая пачка пуста
+        self.assertEqual(worker.run_batch(), 0)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        size = Size.objects.create(name='M', code='m')
+        for i in range(15):
+            product = Product.objects.create(
+                category=category, name=f'Товар {i}', slug=f'product-{i}',
+                description='', price=100, image='products/1.jpg',
+            )
+            ProductSize.objects.create(product=product, size=size, quantity=i % 3)
+        cls.product = product
+        cls.user = User.objects.create_user('buyer')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_catalog_pages(self):
+        for url in ('/', '/shoes/', '/gender/male/', '/shoes/gender/male/', '/search/?q=Товар',
+                    self.product.get_absolute_url(), '/cart/', '/orders/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertQueryBudget(response)
+                self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_catalog_skips_search_vector(self):
+        urls = ('/', '/shoes/', self.product.get_absolute_url(), '/api/products/', f'/api/products/{self.product.id}/')
+        with CaptureQueriesContext(connection) as queries:
+            for url in urls:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertNotIn('search_vector', ' '.join(query['sql'] for query in queries.captured_queries))
+
+    def test_metrics_endpoint(self):
+        self.client.get('/shoes/')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_requests_total{view="product_list_by_category",method="GET",status="200"}',
+                      response.content.decode())
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+
+class FavoriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        cls.product = Product.objects.create(
+            category=category, name='Товар', slug='product', description='', price=100, image='products/1.jpg',
+        )
+        cls.user = User.objects.create_user('buyer')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def toggle(self, **data):
+        return self.client.post(f'/favorites/toggle/{self.product.id}/', data, content_type='application/json')
+
+    def test_toggle_is_idempotent(self):
+        # Первое добавление ещё и создаёт Favorite пользователя
+        self.assertTrue(self.toggle(is_favorite=True).json()['is_favorite'])
+        # Сессия, пользователь, INSERT ... ON CONFLICT DO NOTHING (0 строк) и проверка, почему 0
+        with self.assertNumQueries(4):
+            self.assertTrue(self.toggle(is_favorite=True).json()['is_favorite'])
+        self.assertEqual(FavoriteItem.objects.count(), 1)
+        self.assertEqual(get_favorite_ids(self.user.id), {self.product.id})
+
+        # Без желаемого состояния — переключение; удаление — один DELETE
+        with self.assertNumQueries(3):
+            self.assertFalse(self.toggle().json()['is_favorite'])
+        # Добавление, когда Favorite уже есть, — один INSERT
+        with self.assertNumQueries(3):
+            self.assertTrue(self.toggle(is_favorite=True).json()['is_favorite'])
+        self.client.post(f'/favorites/remove/{self.product.id}/')
+        self.assertEqual(get_favorite_ids(self.user.id), set())
+        response = self.client.post(f'/favorites/remove/{self.product.id}/')
+        self.assertFalse(response.json()['is_favorite'])
+        self.assertFalse(FavoriteItem.objects.exists())
+
+    def test_unknown_product(self):
+        response = self.client.post('/favorites/toggle/0/', {'is_favorite': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        # Во внешней транзакции ошибка тоже сразу, а не при её фиксации
+        with transaction.atomic():
+            with self.assertRaises(Product.DoesNotExist):
+                set_favorite(self.user.id, 0, True)
+            set_favorite(self.user.id, self.product.id, True)
+        self.assertEqual(get_favorite_ids(self.user.id), {self.product.id})
+
+    def test_pages_use_cached_ids(self):
+        self.toggle(is_favorite=True)
+        urls = ('/', self.product.get_absolute_url())
+        for url in urls:
+            self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            catalog, detail = (self.client.get(url) for url in urls)
+        self.assertNotIn('shop_favorite', ' '.join(query['sql'] for query in queries.captured_queries))
+        self.assertIn(self.product.id, catalog.context['user_favorites'])
+        self.assertTrue(detail.context['in_favorites'])
+
+
+class OrderHistoryTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        size = Size.objects.create(name='M', code='m')
+        product = Product.objects.create(
+            category=category, name='Товар', slug='product', description='', price=100, image='products/1.jpg',
+        )
+        cls.user = User.objects.create_user('buyer')
+        orders = Order.objects.bulk_create([Order(user=cls.user, total=200) for _ in range(45)])
+        # Одинаковое время у нескольких заказов: порядок решает id
+        Order.objects.filter(pk__in=[order.pk for order in orders[:5]]).update(created_at=orders[0].created_at)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, size=size, quantity=2, price=100)
+            for order in orders for _ in range(2)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_pages_cover_all_orders(self):
+        seen = []
+        url = '/orders/'
+        while url:
+            response = self.client.get(url)
+            self.assertQueryBudget(response)
+            seen += [order.id for order in response.context['orders']]
+            page = response.context['page']
+            url = f'/orders/?cursor={page.next_cursor}' if page.has_next else None
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(self.client.get('/orders/?cursor=broken').status_code, 404)
+
+    def test_order_detail(self):
+        order = Order.objects.first()
+        response = self.client.get(f'/order/{order.id}/')
+        self.assertQueryBudget(response)
+        self.assertContains(response, '200.00 руб.', count=3)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    router = PrimaryReplicaRouter()
+
+    def route(self, method='get', cookies=None):
+        """Куда уйдёт чтение товара и корзины внутри запроса"""
+        routes = {}
+
+        def view(request):
+            routes['product'] = self.router.db_for_read(Product)
+            routes['cart'] = self.router.db_for_read(Cart)
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        response = ReplicaPinningMiddleware(view)(request)
+        return routes, response
+
+    def test_catalog_reads_go_to_replica(self):
+        routes, response = self.route()
+        self.assertEqual(routes, {'product': 'replica1', 'cart': 'default'})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_to_primary(self):
+        routes, response = self.route('post')
+        self.assertEqual(routes['product'], 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        routes, _ = self.route(cookies={PIN_COOKIE: '1'})
+        self.assertEqual(routes['product'], 'default')
+
+    def test_use_primary(self):
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'shop'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+
+
+@skipUnless('replica1' in settings.DATABASES, 'Нужен алиас replica1: --settings=onlinestore.settings_test')
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    Запросы через настоящий алиас replica1 (зеркало default).
+
+    TransactionTestCase: данные TestCase не зафиксированы и с отдельного
+    соединения реплики не видны. Страницы каталога заполняют кэш с primary,
+    поэтому чтение проверяется на поиске.
+    """
+    # Без алиаса класс пропускается, но раннер всё равно проверяет его базы
+    databases = {'default'} | ({'replica1'} & settings.DATABASES.keys())
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Обувь', slug='shoes')
+        self.product = Product.objects.create(
+            category=category, name='Кроссовки', slug='sneakers',
+            description='', price=100, image='products/1.jpg',
+        )
+        self.user = User.objects.create_user('buyer')
+
+    def product_queries(self, alias):
+        return [q['sql'] for q in self.queries[alias].captured_queries if '"shop_product"' in q['sql']]
+
+    def get(self, *args, **kwargs):
+        """GET с записью запросов по каждому алиасу в self.queries"""
+        self.queries = {alias: CaptureQueriesContext(connections[alias]) for alias in self.databases}
+        with ExitStack() as stack:
+            for context in self.queries.values():
+                stack.enter_context(context)
+            return self.client.get(*args, **kwargs)
+
+    def test_catalog_reads_from_replica(self):
+        response = self.get(reverse('product_search'), {'q': 'кроссовки'})
+        self.assertContains(response, 'Кроссовки')
+        self.assertTrue(self.product_queries('replica1'))
+        self.assertFalse(self.product_queries('default'))
+
+    def test_write_pins_to_primary(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('add_to_favorites', args=[self.product.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # Следующий запрос с cookie читает каталог с primary — своя запись видна сразу
+        response = self.get(reverse('product_search'), {'q': 'кроссовки'})
+        self.assertContains(response, 'Кроссовки')
+        self.assertTrue(self.product_queries('default'))
+        self.assertFalse(self.product_queries('replica1'))
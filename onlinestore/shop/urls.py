@@ -10,8 +10,9 @@ urlpatterns = [
     path('orders/', views.order_list, name='order_list'),
 #urls для favorite
     path('favorites/', views.FavoriteListView.as_view(), name='favorites'),
-    path('favorites/add/<int:product_id>/', views.AddToFavoriteView.as_view(), name='add_to_favorites'),
-    path('favorites/remove/<int:product_id>/', views.RemoveFromFavoriteView.as_view(), name='remove_from_favorites'),
+    path('favorites/toggle/<int:product_id>/', views.ToggleFavoriteView.as_view(), name='toggle_favorite'),
+    path('favorites/add/<int:product_id>/', views.ToggleFavoriteView.as_view(state=True), name='add_to_favorites'),
+    path('favorites/remove/<int:product_id>/', views.ToggleFavoriteView.as_view(state=False), name='remove_from_favorites'),
 
 # urls для cart
     path('cart/', views.CartListViews.as_view(), name='cart_detail'),
@@ -19,6 +20,7 @@ urlpatterns = [
     path('cart/remove/<int:cart_item_id>/', views.RemoveFromCartView.as_view(), name='remove_from_cart'),
 # urls для product
     path('', views.ProductListView.as_view(), name='product_list'),
+    path('search/', views.ProductSearchView.as_view(), name='product_search'),
     path('product/<int:id>/<slug:slug>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('gender/<str:gender>/', views.ProductListView.as_view(), name='product_list_by_gender'),
     path('<slug:category_slug>/', views.ProductListView.as_view(), name='product_list_by_category'),
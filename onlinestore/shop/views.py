@@ -1,6 +1,12 @@
+import json
+from decimal import Decimal
+
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
 from django.db.models.query import Prefetch
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.shortcuts import (
     render,
     get_object_or_404,
@@ -12,19 +18,29 @@ from django.views.generic import ListView, DetailView, DeleteView
 
 from rest_framework.reverse import reverse_lazy
 
+from onlinestore.db_router import use_primary
+
 from .models import (
-    Category,
     Product,
     Size,
     ProductSize,
-    Favorite,
     FavoriteItem,
     Cart,
     CartItem,
     Order,
-    OrderItem,
 )
 from .forms import OrderForm
+from .pagination import KeysetPaginator
+from .cache import (
+    CachedPaginator,
+    get_category_by_slug,
+    list_key,
+    product_key,
+    CATALOG_TIMEOUT,
+)
+from .facets import apply_filters, get_facets, get_filters
+from .search import search_products
+from .services import get_favorite_ids, place_order, set_favorite, CheckoutError
 
 
 class ProductListView(ListView):
@@ -34,31 +50,110 @@ class ProductListView(ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = Product.objects.filter(available=True).select_related('category')
         category_slug = self.kwargs.get('category_slug')
         gender = self.kwargs.get('gender')
+        # Категория и пол задаются путём, размер и цена — GET-параметрами
+        self.filters = get_filters(
+            {key: self.request.GET.get(key) for key in ('size', 'price')}, category_slug, gender
+        )
+        if category_slug and 'category' not in self.filters or gender and 'gender' not in self.filters:
+            raise Http404
+        self.category = get_category_by_slug(category_slug) if category_slug else None
 
-        if category_slug:
-            category = get_object_or_404(Category, slug=category_slug)
-            queryset = queryset.filter(category=category)
-
-        if gender:
-            queryset = queryset.filter(gender=gender)
-
+        # search_vector не нужен шаблону, а страницы целиком кладутся в кэш
+        queryset = apply_filters(
+            Product.objects.filter(available=True).defer('search_vector').select_related('category'), self.filters
+        )
         return queryset.prefetch_related(
             Prefetch('product_sizes', queryset=ProductSize.objects.filter(quantity__gt=0))
         )
 
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        # Страницы каталога не зависят от пользователя и берутся из кэша
+        cache_key = list_key(
+            self.filters.get('category'), self.filters.get('gender'),
+            self.filters.get('size'), self.filters.get('price'),
+        )
+        return CachedPaginator(
+            queryset,
+            per_page,
+            cache_key,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            **kwargs
+        )
+
+    def facet_url(self, facet, value):
+        """Ссылка на каталог с заменой (или снятием, если value=None) одного фильтра"""
+        params = {
+            'category_slug': self.category and self.category.slug,
+            'gender': self.filters.get('gender'),
+            'size': self.filters.get('size'),
+            'price': self.filters.get('price'),
+        }
+        params['category_slug' if facet == 'category' else facet] = value
+
+        if params['category_slug'] and params['gender']:
+            url = reverse('product_list_by_category_gender', args=[params['category_slug'], params['gender']])
+        elif params['category_slug']:
+            url = reverse('product_list_by_category', args=[params['category_slug']])
+        elif params['gender']:
+            url = reverse('product_list_by_gender', args=[params['gender']])
+        else:
+            url = reverse('product_list')
+
+        query = urlencode({key: params[key] for key in ('size', 'price') if params[key]})
+        return f'{url}?{query}' if query else url
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
 
-        user_favorites = []
+        user_favorites = frozenset()
         if self.request.user.is_authenticated:
-            user_favorites = FavoriteItem.objects.filter(favorite__user=self.request.user).values_list('product_id', flat=True)
+            user_favorites = get_favorite_ids(self.request.user.id)
         context['user_favorites'] = user_favorites
+        context['facets'] = self.get_facets()
         return context
 
+    def get_facets(self):
+        facets = get_facets(self.filters)
+        for facet in facets:
+            for option in facet['options']:
+                option['url'] = self.facet_url(facet['name'], None if option['selected'] else option['value'])
+        return facets
+
+
+class ProductSearchView(ProductListView):
+    """Поиск по каталогу (полнотекстовый с нечётким запасным вариантом)"""
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        self.filters = {}
+        if not self.query:
+            return Product.objects.none()
+
+        return search_products(self.query).select_related('category').prefetch_related(
+            Prefetch('product_sizes', queryset=ProductSize.objects.filter(quantity__gt=0))
+        )
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        # Результаты поиска не кэшируются вместе со страницами каталога
+        return self.paginator_class(
+            queryset,
+            per_page,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            **kwargs
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.query
+        return context
+
+    def get_facets(self):
+        return None
+
 
 class ProductDetailView(DetailView):
     model = Product
@@ -68,22 +163,30 @@ class ProductDetailView(DetailView):
     pk_url_kwarg = 'id'
 
     def get_queryset(self):
-        return Product.objects.filter(available=True).prefetch_related(
+        return Product.objects.filter(available=True).defer('search_vector').prefetch_related(
             Prefetch('product_sizes',
                     queryset=ProductSize.objects.select_related('size').filter(quantity__gt=0))
         )
 
+    def get_object(self, queryset=None):
+        key = product_key(self.kwargs.get(self.pk_url_kwarg))
+        product = cache.get(key)
+        if product is None:
+            with use_primary():
+                product = super().get_object(queryset)
+            cache.set(key, product, CATALOG_TIMEOUT)
+        # Товар ищется по id, slug из адреса должен с ним совпадать
+        if product.slug != self.kwargs.get(self.slug_url_kwarg):
+            raise Http404
+        return product
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         product = self.object
         context['available_sizes'] = product.product_sizes.all()
-        context['in_favorites'] = False
-
-        if self.request.user.is_authenticated:
-            context['in_favorites'] = FavoriteItem.objects.filter(
-                favorite__user=self.request.user,
-                product=product
-            ).exists()
+        context['in_favorites'] = (
+            self.request.user.is_authenticated and product.id in get_favorite_ids(self.request.user.id)
+        )
 
         return context
 
@@ -97,29 +200,45 @@ class FavoriteListView(LoginRequiredMixin, ListView):
             favorite__user=self.request.user
         ).select_related('product').prefetch_related('product__product_sizes')
 
-class AddToFavoriteView(LoginRequiredMixin, View):
-    def post(self, request, product_id):
-        product = get_object_or_404(Product, id=product_id)
-        favorite, _ = Favorite.objects.get_or_create(user=request.user)
-        favorite_item, created = FavoriteItem.objects.get_or_create(
-            favorite=favorite,
-            product=product
-        )
+class ToggleFavoriteView(LoginRequiredMixin, View):
+    """
+    Добавляет товар в избранное или убирает из него.
 
-        return JsonResponse({
-            'is_favorite': True,
-            'product_id': product.id
-        })
+    Желаемое состояние передаётся полем is_favorite (форма или JSON), так что
+    повторный клик не меняет результат; без него состояние переключается.
+    Для старых адресов add/remove состояние задаётся в as_view(state=...).
+    """
+    state = None
 
-class RemoveFromFavoriteView(LoginRequiredMixin, View):
     def post(self, request, product_id):
-        favorite = get_object_or_404(Favorite, user=request.user)
-        FavoriteItem.objects.filter(favorite=favorite, product=product_id).delete()
+        is_favorite = self.state
+        if is_favorite is None:
+            is_favorite = self.requested_state(request)
+        if is_favorite is None:
+            is_favorite = product_id not in get_favorite_ids(request.user.id)
+
+        try:
+            set_favorite(request.user.id, product_id, is_favorite)
+        except Product.DoesNotExist:
+            raise Http404
+
         return JsonResponse({
-            'is_favorite': False,
+            'is_favorite': is_favorite,
             'product_id': product_id
         })
 
+    @staticmethod
+    def requested_state(request):
+        value = request.POST.get('is_favorite')
+        if value is None and request.content_type == 'application/json':
+            try:
+                value = json.loads(request.body).get('is_favorite')
+            except (ValueError, AttributeError):
+                value = None
+        if isinstance(value, str):
+            value = {'true': True, '1': True, 'false': False, '0': False}.get(value.lower())
+        return value if isinstance(value, bool) else None
+
 
 class AddToCartView(LoginRequiredMixin, View):
     def post(self, request, product_id):
@@ -180,9 +299,9 @@ class RemoveFromCartView(LoginRequiredMixin, DeleteView):
 def cart_detail(request):
     """Получение корзины пользователя"""
     cart = get_object_or_404(Cart, user=request.user)
-    total_price = cart.total_price
-    print(total_price)
-    return render(request, 'shop/cart/detail.html', {'cart': cart, 'total_price': total_price})
+    items = list(cart.items.with_line_totals())
+    total_price = sum((item.line_total for item in items), Decimal('0'))
+    return render(request, 'shop/cart/detail.html', {'cart': cart, 'items': items, 'total_price': total_price})
 
 class CartListViews(LoginRequiredMixin, ListView):
     model = CartItem
@@ -190,13 +309,12 @@ class CartListViews(LoginRequiredMixin, ListView):
     context_object_name = 'items'
 
     def get_queryset(self):
-        cart, _ = Cart.objects.get_or_create(user=self.request.user)
-        return CartItem.objects.filter(cart=cart).select_related('product')
+        return CartItem.objects.filter(cart__user=self.request.user).with_line_totals()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cart = Cart.objects.get(user=self.request.user)
-        context['total_price'] = cart.total_price
+        # Суммы позиций уже посчитаны в БД, итог собираем из того же запроса
+        context['total_price'] = sum((item.line_total for item in context['items']), Decimal('0'))
         return context
 
 @login_required
@@ -207,41 +325,49 @@ def checkout(request):
     if request.method == 'POST':
         form = OrderForm(request.POST)
         if form.is_valid():
-            order = Order.objects.create(
-                user=request.user,
-                total=cart.total_price,
-                comment=form.cleaned_data['comment']
-            )
-
-            for cart_item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    size = cart_item.size,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price
-                )
-
-            cart.items.all().delete()
-            return redirect('order_detail', order_id=order.id)
+            try:
+                order = place_order(request.user, form.cleaned_data['comment'])
+            except CheckoutError as e:
+                form.add_error(None, str(e))
+            else:
+                return redirect('order_detail', order_id=order.id)
     else:
         form = OrderForm()
 
-    return render(request, 'shop/order/checkout.html', {'form': form, 'cart': cart})
+    items = list(cart.items.with_line_totals())
+    total_price = sum((item.line_total for item in items), Decimal('0'))
+    return render(request, 'shop/order/checkout.html', {
+        'form': form,
+        'cart': cart,
+        'items': items,
+        'total_price': total_price,
+    })
 
 
 @login_required
 def order_detail(request, order_id):
     """Получение конкретного заказа пользователя"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(Order.objects.with_items(), id=order_id, user=request.user)
     return render(request, 'shop/order/detail.html', {'order': order})
 
 
+ORDERS_PER_PAGE = 20
+
+
 @login_required
 def order_list(request):
-    """Получение всех заказов пользователя"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'shop/order/list.html', {'orders': orders})
+    """
+    История заказов пользователя с позициями.
+
+    Keyset-пагинация (?cursor=...) и предзагрузка позиций: страница — два
+    запроса независимо от числа заказов у пользователя.
+    """
+    paginator = KeysetPaginator(Order.objects.filter(user=request.user).with_items(), ORDERS_PER_PAGE)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except ValueError:
+        raise Http404
+    return render(request, 'shop/order/list.html', {'orders': page.object_list, 'page': page})
 
 
 def miniapp_view(request):